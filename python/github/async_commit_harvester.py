@@ -0,0 +1,163 @@
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse, parse_qs
+import requests
+from github_http_cache import cached_get
+from commit_watermarks import since_params
+
+# Bounded asyncio commit harvester.
+# Page 1 of every repository is requested first; its `Link: rel="last"` header
+# tells us how many pages the history has, and the remaining pages are then
+# fetched concurrently. Every request runs through the shared cached_get on a
+# pool sized to the global concurrency limit, so no matter how many repositories
+# or pages are in flight, at most `concurrency` requests hit GitHub at once.
+# Rows are handed out page by page, and `on_done` then says whether the repo's
+# walk completed, so the sink can keep or drop the rows of a repo that failed.
+
+default_concurrency = 16
+
+
+def commit_row(repo_full_name, commit):
+    """
+    Flatten a commits API entry into the row format of commit_history.csv.
+    """
+    return {
+        "Repo Name": repo_full_name,
+        "Commit": commit["sha"],
+        "Commit Message": commit["commit"]["message"],
+        "Commit Date": commit["commit"]["committer"]["date"],
+        "Commit Owner": commit["commit"]["committer"]["name"],
+        "Commit Author": commit["commit"]["author"]["name"],
+        "Author Email": commit["commit"]["author"]["email"],
+        "Author Login": commit["author"]["login"] if commit.get("author") else None
+    }
+
+
+def last_page(response):
+    """
+    Read the page number from the `Link: rel="last"` header (1 if there is none).
+    """
+    last = response.links.get('last')
+    if not last:
+        return 1
+    return int(parse_qs(urlparse(last['url']).query).get('page', ['1'])[0])
+
+
+class AsyncCommitHarvester:
+    def __init__(self, headers, on_rows, on_done=None, concurrency=default_concurrency, watermarks=None):
+        """
+        `on_rows(repo_full_name, rows)` is called on the event loop as soon as each
+        page has been fetched, and `on_done(repo_full_name, complete, newest_row)` once
+        the repo's walk has ended. `watermarks` (see commit_watermarks) switches repos
+        we have seen before to an incremental `since=` walk that stops at the known SHA.
+        """
+        self.headers = headers
+        self.on_rows = on_rows
+        self.on_done = on_done or (lambda repo_full_name, complete, newest: None)
+        self.concurrency = concurrency
+        self.watermarks = watermarks or {}
+        self.executor = None
+
+    async def _get(self, url, params):
+        loop = asyncio.get_running_loop()
+        response = await loop.run_in_executor(
+            self.executor, functools.partial(cached_get, url, headers=self.headers, params=params))
+        response.raise_for_status()
+        return response
+
+    async def _harvest_since(self, repo_full_name, url, since, stop_sha):
+        # Incremental walks are only a page or two long, and pages after the known
+        # SHA must not be emitted, so they are fetched in order
+        newest = None
+        page = 1
+        while True:
+            response = await self._get(url, {"page": page, "per_page": 100, "since": since})
+            commits = response.json()
+            if not commits:
+                return newest
+            rows = []
+            for commit in commits:
+                if commit["sha"] == stop_sha:
+                    break
+                rows.append(commit_row(repo_full_name, commit))
+            if newest is None and rows:
+                newest = rows[0]
+            self.on_rows(repo_full_name, rows)
+            if len(rows) < len(commits):
+                return newest
+            page += 1
+
+    async def _harvest_full(self, repo_full_name, url):
+        response = await self._get(url, {"page": 1, "per_page": 100})
+        rows = [commit_row(repo_full_name, commit) for commit in response.json()]
+        self.on_rows(repo_full_name, rows)
+        newest = rows[0] if rows else None
+
+        # Fan the remaining pages out and stream them in whatever order they finish
+        pages = [asyncio.ensure_future(self._get(url, {"page": page, "per_page": 100}))
+                 for page in range(2, last_page(response) + 1)]
+        try:
+            for next_page in asyncio.as_completed(pages):
+                response = await next_page
+                self.on_rows(repo_full_name, [commit_row(repo_full_name, commit) for commit in response.json()])
+        finally:
+            # Drop the pages still queued once one of them has failed
+            for page in pages:
+                page.cancel()
+        return newest
+
+    async def harvest_repo(self, repo):
+        """
+        Harvest one repository. Returns (complete, newest_row); the rows a repo that
+        failed part-way has already emitted must be dropped, and its watermark must not move.
+        """
+        repo_full_name = f"{repo['owner']}/{repo['name']}"
+        url = f"https://api.github.com/repos/{repo_full_name}/commits"
+        since, stop_sha = since_params(self.watermarks, repo_full_name)
+        logging.info(f"Retrieving commit history for {repo_full_name}...")
+        try:
+            if since:
+                newest = await self._harvest_since(repo_full_name, url, since, stop_sha)
+            else:
+                newest = await self._harvest_full(repo_full_name, url)
+        except requests.exceptions.HTTPError as e:
+            if e.response is not None and e.response.status_code == 409:
+                # The commits API answers 409 for an empty repository: nothing to export
+                logging.info(f"{repo_full_name} is empty.")
+                self.on_done(repo_full_name, True, None)
+                return True, None
+            logging.error(f"Error retrieving commit history for {repo_full_name}: {e}")
+            self.on_done(repo_full_name, False, None)
+            return False, None
+        except requests.exceptions.RequestException as e:
+            logging.error(f"Error retrieving commit history for {repo_full_name}: {e}")
+            self.on_done(repo_full_name, False, None)
+            return False, None
+        self.on_done(repo_full_name, True, newest)
+        logging.info(f"Completed commit history retrieval for {repo_full_name}.")
+        return True, newest
+
+    async def harvest(self, repo_list):
+        """
+        Harvest every repository concurrently. Returns {repo_full_name: (complete, newest_row)}.
+        """
+        self.executor = ThreadPoolExecutor(max_workers=self.concurrency)
+        # Only `concurrency` repos are in progress at once, so each one finishes soon
+        # after it starts instead of every repo queueing its first page ahead of
+        # everyone's remaining pages
+        in_progress = asyncio.Semaphore(self.concurrency)
+
+        async def harvest_one(repo):
+            async with in_progress:
+                return await self.harvest_repo(repo)
+
+        try:
+            results = await asyncio.gather(*(harvest_one(repo) for repo in repo_list))
+        finally:
+            self.executor.shutdown(wait=True)
+        return {f"{repo['owner']}/{repo['name']}": result for repo, result in zip(repo_list, results)}
+
+    def run(self, repo_list):
+        return asyncio.run(self.harvest(repo_list))
@@ -0,0 +1,99 @@
+import hashlib
+import logging
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import requests
+
+# Content-addressed store for downloaded repository files.
+# Files are keyed by their git blob SHA (the `sha` the contents API returns), so
+# a config file shared by hundreds of repositories is downloaded and stored once
+# and every per-repository path is a hard link to the stored blob.
+
+timeout = 10  # Constant for network request timeout
+
+
+def git_blob_sha(data):
+    """
+    Compute the git blob SHA of `data`, the same value the contents API reports.
+    """
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+class BlobStore:
+    def __init__(self, root='.blob_store', max_workers=8):
+        self.root = root
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        # One pooled session shared by every download thread
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount('https://', adapter)
+        self.lock = threading.Lock()
+        self.in_flight = {}
+
+    def path(self, sha):
+        return os.path.join(self.root, sha[:2], sha[2:])
+
+    def _download(self, sha, download_url):
+        response = self.session.get(download_url, timeout=timeout)
+        response.raise_for_status()
+        if git_blob_sha(response.content) != sha:
+            raise ValueError(f"Downloaded content of {download_url} does not match blob {sha}")
+        path = self.path(sha)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(response.content)
+        os.replace(tmp_path, path)
+
+    def _fetch(self, sha, download_url):
+        """
+        Return a future for the blob, sharing downloads of the same SHA between threads.
+        """
+        with self.lock:
+            future = self.in_flight.get(sha)
+            if future is None:
+                future = self.executor.submit(self._download, sha, download_url)
+                self.in_flight[sha] = future
+                future.add_done_callback(lambda f: self._forget(sha, f))
+            return future
+
+    def _forget(self, sha, future):
+        with self.lock:
+            if self.in_flight.get(sha) is future:
+                del self.in_flight[sha]
+
+    def _link(self, sha, dest):
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        if os.path.exists(dest):
+            if os.path.samefile(dest, self.path(sha)):
+                return
+            os.remove(dest)
+        try:
+            os.link(self.path(sha), dest)
+        except OSError:
+            # Hard links need the store and the output on the same file system
+            shutil.copyfile(self.path(sha), dest)
+
+    def materialize(self, files):
+        """
+        Place every (sha, download_url, dest) in `files`, downloading the blobs that
+        are not stored yet concurrently. Returns the number of files placed.
+        """
+        futures = {}
+        for sha, download_url, dest in files:
+            if sha not in futures and not os.path.exists(self.path(sha)):
+                futures[sha] = self._fetch(sha, download_url)
+
+        placed = 0
+        for sha, download_url, dest in files:
+            try:
+                if sha in futures:
+                    futures[sha].result()
+                self._link(sha, dest)
+                placed += 1
+                logging.info(f"Config file {dest} {'downloaded' if sha in futures else 'linked from store'}.")
+            except (requests.exceptions.RequestException, ValueError, OSError) as e:
+                logging.error(f"Failed to store {dest}. Error: {e}")
+        return placed
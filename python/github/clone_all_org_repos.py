@@ -2,8 +2,13 @@ import requests
 import os
 import logging
 import argparse
+import queue
+import threading
 from dotenv import load_dotenv
 import git
+from git_clone_options import add_clone_arguments, validate_clone_arguments, build_clone_options, prepare_reference_store
+from github_http_cache import cached_get
+from repo_index import RepoIndex
 
 # Load environment variables from .env file
 load_dotenv()
@@ -14,6 +19,7 @@ org_name = ''
 github_token = os.getenv('github_token')
 output_dir = "./repos"
 timeout = 10  # Constant for network request timeout
+workers = 8  # Default number of concurrent clones
 
 # Set up logging with desired format
 logging.basicConfig(
@@ -29,7 +35,7 @@ def fetch_repos(org_name, page):
         "Accept": "application/vnd.github.v3+json",
     }
 
-    response = requests.get(
+    response = cached_get(
         f"{github_api_url}/orgs/{org_name}/repos?page={page}&per_page=100",
         headers=headers,
         timeout=timeout
@@ -41,41 +47,122 @@ def fetch_repos(org_name, page):
     return response.json()
 
 
-def clone_all_repos(output_dir, org_name):
+def clone_or_update(repo, output_dir, clone_options=(), reference_store=None):
     """
-    Clone all repositories of the specified organization.
+    Clone a repository, or fetch and fast-forward it if it was cloned before.
+    Returns "cloned" or "updated".
+    """
+    dest = os.path.join(output_dir, repo["name"])
+    if os.path.exists(dest):
+        local_repo = git.Repo(dest)
+        local_repo.remotes.origin.fetch()
+        local_repo.git.merge("--ff-only", f"origin/{repo['default_branch']}")
+        return "updated"
+    if reference_store:
+        prepare_reference_store(reference_store, repo["full_name"], repo["clone_url"])
+    git.Repo.clone_from(repo["clone_url"], dest, multi_options=list(clone_options))
+    return "cloned"
+
+
+def repo_pages(org_name):
+    """
+    Yield the organization's repositories one listing page at a time.
     """
     page = 1
-    total_repos = 0
-    cloned_repos = 0
-    failed_repos = 0
-
     while True:
-        try:
-            repos = fetch_repos(org_name, page)
-        except requests.RequestException as e:
-            logging.error(f"Failed to fetch repos. Error: {e}")
-            break
-
+        repos = fetch_repos(org_name, page)
         if not repos:
-            break
+            return
+        yield repos
+        page += 1
+
 
-        for repo in repos:
-            repo_url = repo["clone_url"]
-            repo_name = repo["name"]
-            dest = os.path.join(output_dir, repo_name)
+def changed_repos(output_dir, org_name):
+    """
+    Refresh the shared repo index and return the repos pushed to since the last
+    run into `output_dir` (plus any that are missing on disk), together with the
+    index watermark to record once they are all cloned or updated.
+    """
+    repo_index = RepoIndex()
+    try:
+        repo_index.refresh(org_name, {
+            "Authorization": f"token {github_token}",
+            "Accept": "application/vnd.github.v3+json",
+        })
+        changed, pushed_watermark = repo_index.changed_since_last_run(org_name, f"clone:{os.path.abspath(output_dir)}")
+        changed_names = {repo["name"] for repo in changed}
+        missing = [repo for repo in repo_index.repos(org_name)
+                   if repo["name"] not in changed_names and not os.path.exists(os.path.join(output_dir, repo["name"]))]
+        return changed + missing, pushed_watermark
+    finally:
+        repo_index.close()
+
+
+def clone_all_repos(output_dir, org_name, workers=workers, clone_options=(), reference_store=None, changed_only=False):
+    """
+    Clone all repositories of the specified organization.
+    Cloning starts as soon as the first listing page arrives; the worker pool
+    always picks the largest repository waiting, so a huge repo does not end up
+    running on its own at the end. With `changed_only`, only the repos pushed to
+    since the last run are fetched, using the shared repo index.
+    """
+    # Entries are (-size, sequence, repo); the end-of-work markers sort last
+    repo_queue = queue.PriorityQueue()
+    counts = {"cloned": 0, "updated": 0, "failed": 0}
+    failed_names = []
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            _, _, repo = repo_queue.get()
+            if repo is None:
+                return
             try:
-                git.Repo.clone_from(repo_url, dest)
-                cloned_repos += 1
-            except git.GitCommandError as e:
-                failed_repos += 1
-                logging.error(f"Failed to clone {repo_name}. Error: {e}")
+                result = clone_or_update(repo, output_dir, clone_options, reference_store)
+                logging.info(f"{result.capitalize()} {repo['name']}.")
+            except Exception as e:
+                # Anything escaping here would end the worker and leave the repo uncounted,
+                # and a changed-only run would then record it as done
+                result = "failed"
+                logging.error(f"Failed to clone or update {repo['name']}. Error: {e}")
+            with lock:
+                counts[result] += 1
+                if result == "failed":
+                    failed_names.append(repo["name"])
+
+    threads = [threading.Thread(target=worker) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
 
-        total_repos += len(repos)
-        page += 1
+    total_repos = 0
+    pushed_watermark = None
+    try:
+        if changed_only:
+            repos, pushed_watermark = changed_repos(output_dir, org_name)
+            pages = [repos]
+        else:
+            pages = repo_pages(org_name)
+        for repos in pages:
+            for repo in repos:
+                repo_queue.put((-repo.get("size", 0), total_repos, repo))
+                total_repos += 1
+    except requests.RequestException as e:
+        logging.error(f"Failed to fetch repos. Error: {e}")
+    finally:
+        # Whatever stopped the listing, the workers must be told to finish or the process never exits
+        for i in range(workers):
+            repo_queue.put((float("inf"), total_repos + i, None))
+        for thread in threads:
+            thread.join()
 
     logging.info(
-        f"Total repositories: {total_repos}. Cloned: {cloned_repos}. Failed: {failed_repos}")
+        f"Total repositories: {total_repos}. Cloned: {counts['cloned']}. Updated: {counts['updated']}. Failed: {counts['failed']}")
+
+    # Failed repos stay "changed" until a later run gets them
+    if pushed_watermark is not None:
+        repo_index = RepoIndex()
+        repo_index.mark_run(org_name, f"clone:{os.path.abspath(output_dir)}", pushed_watermark, failed=failed_names)
+        repo_index.close()
 
 
 def setup_and_run_cloning():
@@ -86,7 +173,13 @@ def setup_and_run_cloning():
         description="Clone all repos from a GitHub org.")
     parser.add_argument("--output", default=output_dir,
                         help="Output directory for cloned repos")
+    parser.add_argument("--workers", type=int, default=workers,
+                        help="Number of repositories cloned or updated in parallel")
+    parser.add_argument("--changed-only", action="store_true",
+                        help="Only clone or update repos pushed to since the last run, using the shared repo index")
+    add_clone_arguments(parser)
     args = parser.parse_args()
+    validate_clone_arguments(parser, args)
 
     if not all([org_name, github_token]):
         logging.error(
@@ -96,7 +189,9 @@ def setup_and_run_cloning():
     if not os.path.exists(args.output):
         os.makedirs(args.output)
 
-    clone_all_repos(args.output, org_name)
+    clone_all_repos(args.output, org_name, workers=args.workers,
+                    clone_options=build_clone_options(args), reference_store=args.reference_store,
+                    changed_only=args.changed_only)
 
 
 setup_and_run_cloning()
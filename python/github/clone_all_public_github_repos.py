@@ -1,16 +1,78 @@
 import os
 import logging
-from github import Github
+import argparse
+import shutil
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 from dotenv import load_dotenv
+from github_graphql import graphql
+from git_clone_options import add_clone_arguments, validate_clone_arguments, build_clone_options, prepare_reference_store
+from search_shards import ShardedSearch, parse_date
 
 
 # Set variables
 load_dotenv()  # take environment variables from .env
 token = os.getenv('token')
 output_dir = './repo_dump'
+min_commits = 10
+workers = 8  # Default number of concurrent clones
+search_workers = 4  # Default number of search shards walked in parallel
+checkpoint_file = 'search_checkpoint.json'
+created_from = '2008-01-01T00:00:00Z'  # GitHub launched in 2008
 
+# Each search page returns 100 repositories together with their default-branch
+# commit count, so the commit filter costs no extra requests
+search_query = '''
+query($q: String!, $after: String) {
+    search(query: $q, type: REPOSITORY, first: 100, after: $after) {
+        repositoryCount
+        pageInfo { hasNextPage endCursor }
+        nodes {
+            ... on Repository {
+                name
+                nameWithOwner
+                url
+                defaultBranchRef { target { ... on Commit { history { totalCount } } } }
+            }
+        }
+    }
+}
+'''
 
-def clone_repos_with_commits(token, output_dir):
+
+def search_page(headers):
+    """
+    Build the page fetcher the sharded search planner calls for every page.
+    """
+    def fetch(query, after):
+        data, _ = graphql(search_query, headers, {'q': query, 'after': after})
+        search = data['search']
+        end_cursor = search['pageInfo']['endCursor'] if search['pageInfo']['hasNextPage'] else None
+        return [node for node in search['nodes'] if node], search['repositoryCount'], end_cursor
+    return fetch
+
+
+def commit_count(repo):
+    branch = repo['defaultBranchRef']
+    return branch['target']['history']['totalCount'] if branch else 0
+
+
+def clone_repo(repo, output_dir, clone_options=(), reference_store=None):
+    clone_url = f"{repo['url']}.git"
+    logging.info(f"Cloning repository: {repo['name']}")
+    try:
+        if reference_store:
+            prepare_reference_store(reference_store, repo['nameWithOwner'], clone_url)
+        subprocess.run(['git', 'clone', '--quiet', *clone_options,
+                        clone_url, os.path.join(output_dir, repo['name'])], check=True)
+    except subprocess.CalledProcessError as e:
+        logging.error(f"Failed to clone {repo['name']}. Error: {e}")
+
+
+def clone_repos_with_commits(token, output_dir, clone_options=(), reference_store=None, workers=workers,
+                             search_from=created_from, search_to=None, checkpoint=checkpoint_file, search_workers=search_workers):
     # Ensure the output directory exists
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
@@ -20,21 +82,60 @@ def clone_repos_with_commits(token, output_dir):
                         format='[%(levelname)s] %(message)s')
 
     # Authenticate with GitHub using a personal access token
-    g = Github(token)
+    headers = {'Authorization': f'Bearer {token}'}
+
+    # Search for public repositories in created: date shards, each small enough to
+    # stay under the 1,000-result search cap; progress is checkpointed per shard
+    search_to = search_to or datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+    search = ShardedSearch('is:public', search_page(headers), parse_date(search_from), parse_date(search_to),
+                           checkpoint, workers=search_workers)
+
+    # Clones run on a bounded pool while the shards keep paging; the search
+    # pauses once a page worth of clones per search worker is waiting. Queued
+    # clones are held in the checkpoint until they finish, so a harvest killed
+    # after a page was checkpointed still clones that page's repos when resumed
+    pending = threading.BoundedSemaphore(workers + 100 * search_workers)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        def submit(repo):
+            pending.acquire()
+            future = executor.submit(clone_repo, repo, output_dir, clone_options, reference_store)
+            future.add_done_callback(lambda _: (search.release(repo['nameWithOwner']), pending.release()))
 
-    # Search for public repositories (this will only get a fraction of them)
-    repositories = g.search_repositories('is:public')
+        resumed = search.held()
+        if resumed:
+            logging.info(f"Resuming {len(resumed)} clones queued by the interrupted run")
+        for repo in resumed.values():
+            # The interrupted clone may have left a partial checkout behind
+            shutil.rmtree(os.path.join(output_dir, repo['name']), ignore_errors=True)
+            submit(repo)
 
-    # Iterate over found repositories
-    for repo in repositories:
-        # Check if the repository has more than 10 commits
-        if repo.get_commits().totalCount > 10:
-            logging.info(f"Cloning repository: {repo.name}")
+        def clone_matching(repos):
+            # Check if the repository has more than 10 commits
+            matching = [repo for repo in repos if commit_count(repo) > min_commits]
+            search.hold({repo['nameWithOwner']: repo for repo in matching})
+            for repo in matching:
+                submit(repo)
 
-            # Clone the repository to the specified directory
-            os.system(
-                f'git clone {repo.clone_url} {os.path.join(output_dir, repo.name)}')
+        search.run(clone_matching)
 
 
-# Call the function to clone the repositories
-clone_repos_with_commits(token, output_dir)
+# Parse the clone mode and call the function to clone the repositories
+parser = argparse.ArgumentParser(
+    description="Clone public GitHub repos with more than 10 commits.")
+parser.add_argument("--output", default=output_dir,
+                    help="Output directory for cloned repos")
+parser.add_argument("--workers", type=int, default=workers,
+                    help="Number of repositories cloned in parallel")
+parser.add_argument("--created-from", default=created_from,
+                    help="Only harvest repos created at or after this time (YYYY-MM-DDTHH:MM:SSZ)")
+parser.add_argument("--created-to",
+                    help="Only harvest repos created at or before this time (default: now)")
+parser.add_argument("--checkpoint", default=checkpoint_file,
+                    help="Per-shard search progress file, reused to resume a harvest")
+parser.add_argument("--search-workers", type=int, default=search_workers,
+                    help="Number of search shards walked in parallel")
+add_clone_arguments(parser)
+args = parser.parse_args()
+validate_clone_arguments(parser, args)
+clone_repos_with_commits(token, args.output, build_clone_options(args), args.reference_store, args.workers,
+                         args.created_from, args.created_to, args.checkpoint, args.search_workers)
@@ -0,0 +1,202 @@
+import csv
+import hashlib
+import os
+import shutil
+import time
+import uuid
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet output is optional, CSV works without pyarrow
+    pa = None
+    pq = None
+
+# Streaming sinks for commit history rows.
+# Rows are written as each page arrives instead of being collected for the
+# whole organization, so memory stays flat however big a history is. Pages are
+# staged per repository and only moved into the output by `commit_repo` once the
+# repository's walk has completed; `discard_repo` drops the rows of a repo that
+# failed part-way, and a killed run's staged rows are cleared on the next open.
+# The output therefore only ever holds whole repositories, which is what the
+# per-repo watermarks describe.
+
+columns = ["Repo Name", "Commit", "Commit Message", "Commit Date", "Commit Owner", "Commit Author", "Author Email", "Author Login"]
+copy_chunk_size = 1024 * 1024
+
+
+def staging_name(repo_full_name):
+    return hashlib.sha1(repo_full_name.encode('utf-8')).hexdigest()
+
+
+class CsvCommitSink:
+    """
+    Stages each repository's pages in its own CSV file next to the output and
+    appends the staged file to the output when the repository completes.
+    """
+
+    def __init__(self, path, append=False):
+        self.path = path
+        self.staging_dir = f"{path}.staging"
+        shutil.rmtree(self.staging_dir, ignore_errors=True)
+        os.makedirs(self.staging_dir)
+        new_file = not append or not os.path.exists(path)
+        self.file = open(path, 'a' if append else 'w', newline='', encoding='utf-8')
+        if new_file:
+            csv.DictWriter(self.file, fieldnames=columns).writeheader()
+        self.staged = {}  # repo_full_name -> rows staged so far
+        self.rows_written = 0  # Rows of completed repositories
+        self.rows_durable = 0  # Rows a later run can rely on finding in the output
+
+    def _staging_path(self, repo_full_name):
+        return os.path.join(self.staging_dir, f"{staging_name(repo_full_name)}.csv")
+
+    def write_rows(self, repo_full_name, rows):
+        with open(self._staging_path(repo_full_name), 'a', newline='', encoding='utf-8') as f:
+            csv.DictWriter(f, fieldnames=columns).writerows(rows)
+        self.staged[repo_full_name] = self.staged.get(repo_full_name, 0) + len(rows)
+
+    def commit_repo(self, repo_full_name):
+        if repo_full_name not in self.staged:
+            return
+        staging_path = self._staging_path(repo_full_name)
+        with open(staging_path, newline='', encoding='utf-8') as f:
+            shutil.copyfileobj(f, self.file, copy_chunk_size)
+        self.file.flush()
+        os.remove(staging_path)
+        self.rows_written += self.staged.pop(repo_full_name)
+        self.rows_durable = self.rows_written
+
+    def discard_repo(self, repo_full_name):
+        if self.staged.pop(repo_full_name, None) is not None:
+            os.remove(self._staging_path(repo_full_name))
+
+    def close(self):
+        self.file.close()
+        shutil.rmtree(self.staging_dir, ignore_errors=True)
+
+
+class ParquetCommitSink:
+    """
+    Writes rows into a directory of Parquet part files, one row group at a time.
+    Repo and author names are dictionary-encoded. Each run writes new part files,
+    and a part file is closed every `rows_per_file` rows, so a killed run only
+    loses the part it was writing. Parts are written under a `_` prefix, which
+    Parquet readers skip, and renamed once their footer is written, so a killed
+    run never leaves a file that breaks `pq.read_table` on the directory.
+    A repository's rows are buffered up to one row group; longer histories spill
+    into a `_stage-*` file whose row groups are copied into the part on commit.
+    """
+
+    def __init__(self, path, append=False, row_group_size=10000, rows_per_file=500000):
+        if pa is None:
+            raise ImportError("Parquet output requires pyarrow (pip install pyarrow)")
+        self.path = path
+        self.row_group_size = row_group_size
+        self.rows_per_file = rows_per_file
+        self.schema = pa.schema([
+            ("Repo Name", pa.dictionary(pa.int32(), pa.string())),
+            ("Commit", pa.string()),
+            ("Commit Message", pa.string()),
+            ("Commit Date", pa.string()),
+            ("Commit Owner", pa.dictionary(pa.int32(), pa.string())),
+            ("Commit Author", pa.dictionary(pa.int32(), pa.string())),
+            ("Author Email", pa.dictionary(pa.int32(), pa.string())),
+            ("Author Login", pa.dictionary(pa.int32(), pa.string())),
+        ])
+        os.makedirs(path, exist_ok=True)
+        for name in os.listdir(path):
+            # Unfinished parts and staged repos of a killed run are never readable;
+            # a fresh export also drops the finished parts
+            if name.endswith('.parquet') and (name.startswith(('_part-', '_stage-')) or not append):
+                os.remove(os.path.join(path, name))
+        self.run_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self.part = 0
+        self.writer = None
+        self.rows_in_file = 0
+        self.buffer = []
+        self.staged = {}  # repo_full_name -> {'rows': [...], 'writer': ParquetWriter or None, 'path': ...}
+        self.rows_written = 0  # Rows of completed repositories
+        self.rows_durable = 0  # Rows in closed part files, which a later run can rely on
+
+    def _write_table(self, table):
+        if self.writer is None:
+            self.part_name = f"part-{self.run_id}-{self.part:05d}.parquet"
+            self.writer = pq.ParquetWriter(os.path.join(self.path, f"_{self.part_name}"), self.schema)
+        self.writer.write_table(table)
+        self.rows_in_file += table.num_rows
+        if self.rows_in_file >= self.rows_per_file:
+            self._close_part()
+
+    def _flush_row_group(self):
+        if self.buffer:
+            self._write_table(pa.Table.from_pylist(self.buffer, schema=self.schema))
+            self.buffer = []
+
+    def _close_part(self):
+        if self.writer is not None:
+            self.writer.close()
+            os.replace(os.path.join(self.path, f"_{self.part_name}"), os.path.join(self.path, self.part_name))
+            self.writer = None
+            self.rows_durable += self.rows_in_file
+            self.rows_in_file = 0
+            self.part += 1
+
+    def _spill(self, stage):
+        if stage['writer'] is None:
+            stage['writer'] = pq.ParquetWriter(stage['path'], self.schema)
+        stage['writer'].write_table(pa.Table.from_pylist(stage['rows'], schema=self.schema))
+        stage['rows'] = []
+
+    def write_rows(self, repo_full_name, rows):
+        stage = self.staged.setdefault(repo_full_name, {
+            'rows': [], 'writer': None, 'count': 0,
+            'path': os.path.join(self.path, f"_stage-{self.run_id}-{staging_name(repo_full_name)}.parquet")})
+        stage['rows'].extend(rows)
+        stage['count'] += len(rows)
+        if len(stage['rows']) >= self.row_group_size:
+            self._spill(stage)
+
+    def commit_repo(self, repo_full_name):
+        stage = self.staged.pop(repo_full_name, None)
+        if stage is None:
+            return
+        if stage['writer'] is not None:
+            # A long history: copy its staged row groups over one at a time
+            if stage['rows']:
+                self._spill(stage)
+            stage['writer'].close()
+            self._flush_row_group()
+            staged_file = pq.ParquetFile(stage['path'])
+            for group in range(staged_file.num_row_groups):
+                self._write_table(staged_file.read_row_group(group).cast(self.schema))
+            os.remove(stage['path'])
+        else:
+            # Short histories share row groups
+            self.buffer.extend(stage['rows'])
+            if len(self.buffer) >= self.row_group_size:
+                self._flush_row_group()
+        self.rows_written += stage['count']
+
+    def discard_repo(self, repo_full_name):
+        stage = self.staged.pop(repo_full_name, None)
+        if stage is not None and stage['writer'] is not None:
+            stage['writer'].close()
+            os.remove(stage['path'])
+
+    def close(self):
+        for repo_full_name in list(self.staged):
+            self.discard_repo(repo_full_name)
+        self._flush_row_group()
+        self._close_part()
+
+
+def open_commit_sink(path, output_format='csv', append=False):
+    """
+    Open the sink for `output_format` ('csv' or 'parquet').
+    """
+    if output_format == 'parquet':
+        return ParquetCommitSink(path, append=append)
+    if output_format == 'csv':
+        return CsvCommitSink(path, append=append)
+    raise ValueError(f"Unsupported output format: {output_format}")
@@ -0,0 +1,49 @@
+import json
+import logging
+import os
+
+# Per-repository commit watermarks for incremental commit exports.
+# The checkpoint file maps "owner/name" to the newest exported commit:
+#   {"hashicorp/terraform-provider-aws": {"sha": "...", "date": "2023-08-01T12:00:00Z"}}
+
+
+def load_watermarks(checkpoint_path, output_path):
+    """
+    Load the watermarks written by the previous run. They are only valid while
+    the output file they describe still exists, otherwise a full export is needed.
+    """
+    if not os.path.exists(output_path) or not os.path.exists(checkpoint_path):
+        return {}
+    try:
+        with open(checkpoint_path) as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logging.warning(f"Ignoring unreadable checkpoint {checkpoint_path}. Error: {e}")
+        return {}
+
+
+def save_watermarks(watermarks, checkpoint_path):
+    """
+    Atomically replace the checkpoint file.
+    """
+    tmp_path = f"{checkpoint_path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(watermarks, f, indent=4, sort_keys=True)
+    os.replace(tmp_path, checkpoint_path)
+
+
+def update_watermark(watermarks, repo_full_name, sha, date):
+    """
+    Record the newest commit of a repository (the first one the commits API returns).
+    """
+    watermarks[repo_full_name] = {'sha': sha, 'date': date}
+
+
+def since_params(watermarks, repo_full_name):
+    """
+    Return the `since` value and the known SHA to stop paging at for a repository.
+    """
+    watermark = watermarks.get(repo_full_name)
+    if not watermark:
+        return None, None
+    return watermark['date'], watermark['sha']
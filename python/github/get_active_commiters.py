@@ -1,8 +1,13 @@
-from github import Github, GithubException
+from github_graphql import graphql, quote, GraphQLError
+from graphql_commit_history import transient, max_attempts
 import logging
 import csv
 import os
-from datetime import datetime, timedelta
+import time
+import requests
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
 
 
@@ -11,46 +16,121 @@ load_dotenv()  # take environment variables from .env
 access_token = os.getenv('token')
 organizations = [""]
 csv_file = 'active_users.csv'
+window_days = 60
+batch_size = 25  # Repositories per history query
+org_workers = 4  # Organizations processed concurrently
 
-# Initialize Github object
-g = Github(access_token)
+headers = {'Authorization': f'Bearer {access_token}'}
 
 # Logging Configuration
 logging.basicConfig(filename='github_query.log', level=logging.INFO)
 logging.info("Script started")
 
+# Repositories ordered by last push, so listing stops at the first one outside the window
+repos_query = '''
+query($org: String!, $after: String) {
+    organization(login: $org) {
+        repositories(first: 100, after: $after, orderBy: {field: PUSHED_AT, direction: DESC}) {
+            pageInfo { hasNextPage endCursor }
+            nodes { name pushedAt }
+        }
+    }
+}
+'''
+
+
+def fetch_active_repos(org_name, since):
+    """
+    List the repositories of an organization pushed to since `since`.
+    """
+    repos = []
+    cursor = None
+    while True:
+        data, _ = graphql(repos_query, headers, {'org': org_name, 'after': cursor})
+        repositories = data['organization']['repositories']
+        for repo in repositories['nodes']:
+            if repo['pushedAt'] is None or repo['pushedAt'] < since:
+                return repos
+            repos.append(repo['name'])
+        if not repositories['pageInfo']['hasNextPage']:
+            return repos
+        cursor = repositories['pageInfo']['endCursor']
+
+
+def build_history_query(org_name, batch, since):
+    aliases = []
+    for alias, repo in batch.items():
+        arguments = f"first: 100, since: {quote(since)}" + (f", after: {quote(repo['after'])}" if repo['after'] else "")
+        aliases.append(f'''
+        {alias}: repository(owner: {quote(org_name)}, name: {quote(repo['name'])}) {{
+            defaultBranchRef {{ target {{ ... on Commit {{ history({arguments}) {{
+                pageInfo {{ hasNextPage endCursor }}
+                nodes {{ author {{ user {{ login }} }} }}
+            }} }} }} }}
+        }}''')
+    return 'query {' + ''.join(aliases) + '\n}'
+
 
 def fetch_users_who_committed(org_name):
     logging.info(f"Fetching repositories for organization: {org_name}")
-    org = g.get_organization(org_name)
-    active_users = {}
-    sixty_days_ago = datetime.utcnow() - timedelta(days=60)
-
-    repo_count = 0
-    for repo in org.get_repos():
-        repo_count += 1
-        logging.info(
-            f"Fetching data for repository: {repo.name} (Repo {repo_count})")
+    since = (datetime.now(timezone.utc) - timedelta(days=window_days)).strftime('%Y-%m-%dT%H:%M:%SZ')
+    active_users = Counter()
+
+    repos = fetch_active_repos(org_name, since)
+    logging.info(f"{len(repos)} repositories in {org_name} were pushed to in the last {window_days} days")
+
+    # Author logins of many repositories per query; each alias keeps its own cursor and
+    # finished repositories make room for the next ones. A repository's logins only
+    # count once its whole window has been read, so a skipped repo leaves no partial total
+    pending = [{'name': name, 'after': None, 'users': Counter(), 'attempts': 0} for name in reversed(repos)]
+    size = batch_size
+    batch = {}
+    next_alias = 0
+    while pending or batch:
+        while pending and len(batch) < size:
+            batch[f"r{next_alias}"] = pending.pop()
+            next_alias += 1
 
         try:
-            commit_count = 0
-            for commit in repo.get_commits(since=sixty_days_ago):
-                commit_count += 1
-                try:
-                    username = commit.author.login
-                    if username not in active_users:
-                        active_users[username] = 0
-                    active_users[username] += 1
-                except AttributeError:  # If commit.author is None
-                    continue
-            logging.info(
-                f"Processed {commit_count} commits in repo: {repo.name}")
-
-        except GithubException as e:
+            data, errors = graphql(build_history_query(org_name, batch, since), headers)
+        except (requests.exceptions.RequestException, GraphQLError) as e:
+            if transient(e) and len(batch) > 1:
+                # Requeue half of the batch with its cursors and retry the rest as a smaller query
+                aliases = list(batch)
+                for alias in reversed(aliases[len(aliases) // 2:]):
+                    pending.append(batch.pop(alias))
+                size = len(batch)
+                logging.warning(f"History query for {org_name} failed ({e}), retrying with {size} repositories per query")
+                continue
+            repo = next(iter(batch.values()))
+            repo['attempts'] += 1
+            if transient(e) and repo['attempts'] < max_attempts:
+                logging.warning(f"History query for {repo['name']} failed ({e}), retrying")
+                time.sleep(2 ** repo['attempts'])
+                continue
             logging.warning(
-                f"Skipping repository {repo.name} due to GitHub exception: {e}")
+                f"Skipping repositories {', '.join(repo['name'] for repo in batch.values())} due to GitHub exception: {e}")
+            batch = {}
             continue
 
+        for alias, repo in list(batch.items()):
+            repository = data.get(alias)
+            if repository is None or repository['defaultBranchRef'] is None:
+                if repository is None:
+                    logging.warning(f"Skipping repository {repo['name']} due to GitHub exception: {errors}")
+                del batch[alias]
+                continue
+
+            history = repository['defaultBranchRef']['target']['history']
+            # Commits whose author is not linked to a GitHub user are not counted
+            repo['users'].update(node['author']['user']['login'] for node in history['nodes'] if node['author']['user'])
+            if history['pageInfo']['hasNextPage']:
+                repo['after'] = history['pageInfo']['endCursor']
+            else:
+                logging.info(f"Processed commits in repo: {repo['name']}")
+                active_users.update(repo['users'])
+                del batch[alias]
+
     logging.info(
         f"Finished processing repositories for organization: {org_name}")
     return active_users
@@ -61,23 +141,23 @@ with open(csv_file, mode='w', newline='') as file:
     writer = csv.writer(file)
     writer.writerow(['Organization', 'Username', 'Commit Count'])
 
-    org_count = 0
-    for org in organizations:
-        org_count += 1
-        logging.info(f"Processing organization: {org} (Org {org_count})")
+    # Organizations are fetched concurrently, results are written in their original order
+    with ThreadPoolExecutor(max_workers=org_workers) as executor:
+        results = executor.map(fetch_users_who_committed, organizations)
 
-        active_users = fetch_users_who_committed(org)
+        for org_count, (org, active_users) in enumerate(zip(organizations, results), start=1):
+            logging.info(f"Processing organization: {org} (Org {org_count})")
 
-        logging.info(
-            f"Found {len(active_users)} active users for organization: {org}")
-        print(
-            f"Organization: {org}, Users who committed in last 60 days: {len(active_users)}")
+            logging.info(
+                f"Found {len(active_users)} active users for organization: {org}")
+            print(
+                f"Organization: {org}, Users who committed in last {window_days} days: {len(active_users)}")
 
-        for username, commit_count in active_users.items():
-            logging.info(f"Writing data for user: {username}")
-            print(f"Username: {username}, Commit Count: {commit_count}")
-            writer.writerow([org, username, commit_count])
+            for username, commit_count in active_users.items():
+                logging.info(f"Writing data for user: {username}")
+                print(f"Username: {username}, Commit Count: {commit_count}")
+                writer.writerow([org, username, commit_count])
 
-        logging.info(f"Finished processing organization: {org}")
+            logging.info(f"Finished processing organization: {org}")
 
 logging.info("Script completed")
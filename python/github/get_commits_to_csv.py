@@ -1,7 +1,8 @@
 import csv
-import requests
 from dotenv import load_dotenv
 import os
+from github_http_cache import cached_get
+from commit_watermarks import load_watermarks, save_watermarks, update_watermark, since_params
 
 
 # Set variables
@@ -16,45 +17,72 @@ headers = {
 }
 
 csv_file_path = "commits.csv"
+# Newest exported commit per repo; later runs only append commits newer than this
+checkpoint_file_path = "commits_checkpoint.json"
 
 
-def get_all_commits(repo_owner, repo_name, headers):
+def get_all_commits(repo_owner, repo_name, headers, since=None, stop_sha=None):
+    # Returns the commits (newest first) and whether paging reached the end without an error
     api_url = f"https://api.github.com/repos/{repo_owner}/{repo_name}/commits"
     commits = []
     page = 1
     while True:
         params = {"page": page, "per_page": 100}
-        response = requests.get(api_url, headers=headers, params=params)
+        if since:
+            params["since"] = since
+        response = cached_get(api_url, headers=headers, params=params)
         if response.status_code == 200:
             page_commits = response.json()
             if len(page_commits) > 0:
-                commits.extend(page_commits)
+                for commit in page_commits:
+                    # Everything from the last exported commit onwards is already in the CSV
+                    if commit['sha'] == stop_sha:
+                        return commits, True
+                    commits.append(commit)
                 page += 1
             else:
                 break
         else:
             print(
                 f"Error: {response.status_code} - {response.json()['message']}")
-            break
-    return commits
+            return commits, False
+    return commits, True
 
 
-def retrieve_commits_to_csv(repo_list, csv_file_path, headers):
-    with open(csv_file_path, 'w', newline='') as csv_file:
+def retrieve_commits_to_csv(repo_list, csv_file_path, headers, checkpoint_file_path=checkpoint_file_path):
+    watermarks = load_watermarks(checkpoint_file_path, csv_file_path)
+    # Append to the existing export when we have watermarks for it, otherwise start over
+    mode = 'a' if watermarks else 'w'
+    with open(csv_file_path, mode, newline='') as csv_file:
         writer = csv.writer(csv_file)
-        writer.writerow(["Repository", "Commit SHA", "Commit Message",
-                        "Commit Branch", "Commit Date", "Commit Owner"])
+        if mode == 'w':
+            writer.writerow(["Repository", "Commit SHA", "Commit Message",
+                            "Commit Branch", "Commit Date", "Commit Owner"])
         for repo in repo_list:
             repo_owner, repo_name = repo['owner'], repo['name']
-            commits = get_all_commits(repo_owner, repo_name, headers)
+            repo_full_name = f"{repo_owner}/{repo_name}"
+            since, stop_sha = since_params(watermarks, repo_full_name)
+            commits, complete = get_all_commits(
+                repo_owner, repo_name, headers, since=since, stop_sha=stop_sha)
+            if not complete:
+                # Writing a partial history would leave rows the watermark does not cover
+                print(f"Skipping {repo_full_name}, its commit history could not be fully retrieved")
+                continue
             for commit in commits:
                 commit_sha = commit['sha']
                 commit_message = commit['commit']['message']
                 commit_branch = commit['commit']['tree']['sha']
                 commit_date = commit['commit']['committer']['date']
                 commit_owner = commit['commit']['author']['name']
-                writer.writerow([f"{repo_owner}/{repo_name}", commit_sha,
+                writer.writerow([repo_full_name, commit_sha,
                                 commit_message, commit_branch, commit_date, commit_owner])
+            print(f"Appended {len(commits)} new commits for {repo_full_name}")
+
+            if commits:
+                csv_file.flush()
+                update_watermark(watermarks, repo_full_name,
+                                 commits[0]['sha'], commits[0]['commit']['committer']['date'])
+                save_watermarks(watermarks, checkpoint_file_path)
 
 
 retrieve_commits_to_csv(repo_list, csv_file_path, headers)
@@ -1,112 +1,129 @@
 import requests
-import pandas as pd
-import threading
+import logging
 from dotenv import load_dotenv
 import os
+from repo_index import RepoIndex
+from commit_watermarks import load_watermarks, save_watermarks, update_watermark
+from async_commit_harvester import AsyncCommitHarvester
+from commit_sink import open_commit_sink
+from graphql_commit_history import fetch_commit_history_graphql
 
 
 # Set variables
 load_dotenv()  # take environment variables from .env
 api_key = os.getenv('api_key')
 org_name = "my_org_name"
-
-
-def get_repo_list():
-    url = f"https://api.github.com/orgs/{org_name}/repos"
+output_format = os.getenv('COMMIT_OUTPUT_FORMAT', 'csv')  # 'csv' or 'parquet' in .env
+# A CSV file, or a directory of Parquet part files
+output_file = "commit_history.parquet" if output_format == 'parquet' else "commit_history.csv"
+# Newest exported commit per repo; later runs only append commits newer than this
+checkpoint_file = "commit_history_checkpoint.json"
+# Global limit on in-flight GitHub requests across all repositories and pages
+max_concurrency = int(os.getenv('GITHUB_MAX_CONCURRENCY', '16'))
+# 'rest' pages each repo's commits API, 'graphql' batches many repos per query
+fetch_mode = os.getenv('COMMIT_FETCH_MODE', 'rest')  # 'rest' or 'graphql' in .env
+graphql_batch_size = int(os.getenv('GRAPHQL_BATCH_SIZE', '25'))
+
+# Shared repo metadata index; lets a refresh skip repos nobody pushed to since the last run
+repo_index = RepoIndex()
+index_consumer = 'commit_history'
+
+logging.basicConfig(
+    format='%(asctime)s - %(levelname)s - %(message)s', level=logging.INFO)
+
+
+def get_repo_list(changed_only=False):
+    """
+    List the organization's repos from the local index after refreshing it.
+    Returns the repos (only those pushed to since the last run when `changed_only`)
+    and the index watermark to record once they have been processed.
+    """
     headers = {
         "Authorization": f"Bearer {api_key}",
         "Accept": "application/vnd.github.v3+json"
     }
 
     try:
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        repos = response.json()
-
-        repo_list = []
-        for repo in repos:
-            repo_list.append({"owner": org_name, "name": repo["name"]})
-
-        return repo_list
-
+        repo_index.refresh(org_name, headers)
     except requests.exceptions.RequestException as e:
         print(
             f"Error retrieving repository list for organization {org_name}: {e}")
+        return [], None
+
+    repos, pushed_watermark = repo_index.changed_since_last_run(org_name, index_consumer)
+    if not changed_only:
+        repos = repo_index.repos(org_name)
+
+    repo_list = []
+    for repo in repos:
+        repo_list.append({"owner": org_name, "name": repo["name"]})
 
-    return []
+    return repo_list, pushed_watermark
 
 
-def get_commit_history(repo_owner, repo_name, commit_data):
-    url = f"https://api.github.com/repos/{repo_owner}/{repo_name}/commits"
+def retrieve_commit_history(repo_list):
+    watermarks = load_watermarks(checkpoint_file, output_file)
+    new_watermarks = dict(watermarks)
     headers = {
         "Authorization": f"Bearer {api_key}",
         "Accept": "application/vnd.github.v3+json"
     }
 
-    try:
-        page = 1
-        while True:
-            params = {
-                "page": page,
-                "per_page": 100
-            }
-            response = requests.get(url, headers=headers, params=params)
-            response.raise_for_status()
-            commits = response.json()
-
-            if not commits:
-                break
-
-            for commit in commits:
-                commit_sha = commit["sha"]
-
-                commit_data.append({
-                    "Repo Name": f"{repo_owner}/{repo_name}",
-                    "Commit": commit_sha,
-                    "Commit Message": commit["commit"]["message"],
-                    "Commit Date": commit["commit"]["committer"]["date"],
-                    "Commit Owner": commit["commit"]["committer"]["name"]
-                })
-
-            page += 1
-
-    except requests.exceptions.RequestException as e:
-        print(
-            f"Error retrieving commit history for {repo_owner}/{repo_name}: {e}")
-
+    # Rows are staged as each page arrives and kept once their repository completes;
+    # append only when the previous export is still valid
+    sink = open_commit_sink(output_file, output_format, append=bool(watermarks))
+    # Watermarks of completed repos wait here until the sink has their rows on disk
+    # (Parquet rows only are once their part file is closed)
+    pending = []
+    if not watermarks:
+        # A fresh export replaces the output, so drop the watermarks that described the old one
+        save_watermarks(new_watermarks, checkpoint_file)
+
+    def save_durable_watermarks():
+        saved = False
+        while pending and pending[0][0] <= sink.rows_durable:
+            _, repo_full_name, newest = pending.pop(0)
+            update_watermark(new_watermarks, repo_full_name, newest["Commit"], newest["Commit Date"])
+            saved = True
+        if saved:
+            save_watermarks(new_watermarks, checkpoint_file)
+
+    def write_rows(repo_full_name, rows):
+        sink.write_rows(repo_full_name, rows)
+
+    def repo_done(repo_full_name, complete, newest):
+        # Rows of a repo that failed part-way are dropped, so its next walk does not duplicate them
+        if not complete:
+            sink.discard_repo(repo_full_name)
+            return
+        sink.commit_repo(repo_full_name)
+        if newest:
+            pending.append((sink.rows_written, repo_full_name, newest))
+            save_durable_watermarks()
 
-def retrieve_commit_history(repo_list):
-    commit_data = []
-    lock = threading.Lock()
-
-    def thread_task(repo):
-        print(
-            f"Retrieving commit history for {repo['owner']}/{repo['name']}...")
-        repo_commit_data = []
-        get_commit_history(repo["owner"], repo["name"], repo_commit_data)
-
-        with lock:
-            commit_data.extend(repo_commit_data)
-
-        print(
-            f"Completed commit history retrieval for {repo['owner']}/{repo['name']}.")
-
-    threads = []
-    for repo in repo_list:
-        thread = threading.Thread(target=thread_task, args=(repo,))
-        threads.append(thread)
-        thread.start()
-
-    for thread in threads:
-        thread.join()
-
-    df = pd.DataFrame(commit_data)
-    df.to_csv("commit_history.csv", index=False)
-    print("Commit history saved to commit_history.csv")
-
-
-# Get the repository list for the organization
-repo_list = get_repo_list()
-
-# Retrieve commit history for the repositories
-retrieve_commit_history(repo_list)
+    try:
+        if fetch_mode == 'graphql':
+            results = fetch_commit_history_graphql(
+                repo_list, headers, write_rows, on_done=repo_done, watermarks=watermarks, batch_size=graphql_batch_size)
+        else:
+            harvester = AsyncCommitHarvester(
+                headers, write_rows, on_done=repo_done, concurrency=max_concurrency, watermarks=watermarks)
+            results = harvester.run(repo_list)
+    finally:
+        sink.close()
+        save_durable_watermarks()
+
+    print(f"{sink.rows_written} new commits saved to {output_file}")
+    # Names of the repos to retry next run
+    return [repo_full_name.split('/', 1)[1] for repo_full_name, (complete, _) in results.items() if not complete]
+
+
+# Get the repository list for the organization; an incremental export only needs
+# the repos that were pushed to since the last run
+incremental = bool(load_watermarks(checkpoint_file, output_file))
+repo_list, pushed_watermark = get_repo_list(changed_only=incremental)
+
+# Retrieve commit history for the repositories; repos that failed are picked up again next run
+failed_repos = retrieve_commit_history(repo_list)
+if pushed_watermark is not None:
+    repo_index.mark_run(org_name, index_consumer, pushed_watermark, failed=failed_repos)
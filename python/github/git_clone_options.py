@@ -0,0 +1,66 @@
+import logging
+import os
+import re
+import subprocess
+import threading
+
+# Clone modes shared by the bulk cloning scripts.
+#   --filter blob:none   commits and trees only, file contents are fetched on demand
+#   --filter tree:0      commit graph only
+#   --depth N            only the last N commits
+#   --single-branch      only the default branch
+#   --reference-store    objects are kept once in a shared bare repository and every
+#                        clone borrows them through git alternates, so forks and
+#                        near-duplicate repositories are not stored twice
+
+_store_init_lock = threading.Lock()
+
+
+def add_clone_arguments(parser):
+    parser.add_argument("--filter", choices=["blob:none", "tree:0"],
+                        help="Partial clone filter")
+    parser.add_argument("--depth", type=int,
+                        help="Shallow clone with history truncated to this many commits")
+    parser.add_argument("--single-branch", action="store_true",
+                        help="Only clone the default branch")
+    parser.add_argument("--reference-store",
+                        help="Shared bare repository used as an alternates object store")
+
+
+def validate_clone_arguments(parser, args):
+    if args.reference_store and args.filter:
+        parser.error("--reference-store cannot be combined with --filter, the store needs complete objects")
+    if args.depth is not None and args.depth < 1:
+        parser.error("--depth must be at least 1")
+
+
+def build_clone_options(args):
+    """
+    Translate the parsed arguments into `git clone` options.
+    """
+    options = []
+    if args.filter:
+        options.append(f"--filter={args.filter}")
+    if args.depth:
+        options.append(f"--depth={args.depth}")
+    if args.single_branch:
+        options.append("--single-branch")
+    if args.reference_store:
+        options.append(f"--reference={os.path.abspath(args.reference_store)}")
+    return options
+
+
+def prepare_reference_store(store, name, url):
+    """
+    Fetch a repository into the shared bare store before it is cloned with --reference.
+    Objects the store already has (e.g. from the upstream of a fork) are not downloaded again.
+    """
+    with _store_init_lock:
+        if not os.path.exists(os.path.join(store, "HEAD")):
+            subprocess.run(["git", "init", "--quiet", "--bare", store], check=True)
+            # Pruning unreachable objects could pull them from under the clones borrowing them
+            subprocess.run(["git", "-C", store, "config", "gc.auto", "0"], check=True)
+    namespace = re.sub(r"[^A-Za-z0-9._-]", "_", name)
+    logging.info(f"Fetching {name} into reference store {store}")
+    subprocess.run(["git", "-C", store, "fetch", "--quiet", "--no-tags", url,
+                    f"+refs/heads/*:refs/remotes/{namespace}/*"], check=True)
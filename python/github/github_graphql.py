@@ -0,0 +1,43 @@
+import json
+import requests
+from github_rate_limit import governed_request
+
+# Shared helpers for GitHub GraphQL calls.
+
+graphql_url = "https://api.github.com/graphql"
+timeout = 30  # GraphQL batches are larger than REST pages
+
+# One pooled session so repeated queries reuse their connections
+session = requests.Session()
+
+
+class GraphQLError(Exception):
+    """
+    Raised when a GraphQL response carries errors and no usable data.
+    """
+
+
+def quote(value):
+    """
+    Render a Python string as a GraphQL string literal.
+    """
+    return json.dumps(value)
+
+
+def graphql(query, headers, variables=None):
+    """
+    Run a GraphQL query and return (data, errors).
+    Partial results are normal for aliased batch queries: an alias that failed
+    (e.g. a deleted repository) shows up as None in `data` with an entry in
+    `errors` that carries its alias in `path`.
+    """
+    response = governed_request(
+        lambda request_headers: session.post(graphql_url, headers=request_headers,
+                                             json={'query': query, 'variables': variables or {}}, timeout=timeout),
+        headers, resource='graphql')
+    response.raise_for_status()
+    body = response.json()
+    errors = body.get('errors') or []
+    if body.get('data') is None:
+        raise GraphQLError("; ".join(error.get('message', str(error)) for error in errors))
+    return body['data'], errors
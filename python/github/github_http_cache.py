@@ -0,0 +1,129 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import requests
+from dotenv import load_dotenv
+from github_rate_limit import governed_request
+
+# Shared conditional-request cache for GitHub REST calls.
+# Response bodies are stored on disk together with their ETag/Last-Modified
+# validators; repeat requests send If-None-Match/If-Modified-Since and a 304
+# (which GitHub does not count against the rate limit) is served from disk.
+
+load_dotenv()  # take environment variables from .env
+cache_dir = os.getenv('GITHUB_CACHE_DIR', '.github_cache')
+cache_enabled = os.getenv('GITHUB_CACHE', 'True') == 'True'  # 'True' or 'False' in .env
+timeout = 10  # Default network request timeout
+
+# Headers that are replayed from disk when a 304 is served from the cache
+cached_headers = ['Content-Type', 'ETag', 'Last-Modified', 'Link']
+
+# One pooled session so repeated calls reuse their connections
+session = requests.Session()
+_write_lock = threading.Lock()
+
+
+def _cache_key(url, headers, params):
+    """
+    Build the cache key from everything that changes the response body.
+    The token is hashed rather than stored so it never lands on disk.
+    """
+    headers = headers or {}
+    key = json.dumps({
+        'url': url,
+        'params': sorted((params or {}).items()),
+        'accept': headers.get('Accept', ''),
+        'auth': hashlib.sha256(headers.get('Authorization', '').encode()).hexdigest(),
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def _entry_paths(key):
+    directory = os.path.join(cache_dir, key[:2])
+    return os.path.join(directory, f"{key}.json"), os.path.join(directory, f"{key}.body")
+
+
+def _load_entry(key):
+    meta_path, body_path = _entry_paths(key)
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+        with open(body_path, 'rb') as f:
+            body = f.read()
+    except (OSError, ValueError):
+        return None, None
+    return meta, body
+
+
+def _store_entry(key, url, response):
+    meta_path, body_path = _entry_paths(key)
+    meta = {
+        'url': url,
+        'headers': {name: response.headers[name] for name in cached_headers if name in response.headers},
+    }
+    with _write_lock:
+        os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+        # Write to temporary files first so an interrupted run never leaves a torn entry
+        for path, data, mode in ((body_path, response.content, 'wb'), (meta_path, json.dumps(meta), 'w')):
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, mode) as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+
+
+def _replay(response, meta, body):
+    """
+    Turn a 304 response into the cached 200 response, keeping the fresh
+    rate-limit headers GitHub sends along with the 304.
+    """
+    response.status_code = 200
+    response._content = body
+    response.headers.update(meta['headers'])
+    response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+    response.from_cache = True
+    return response
+
+
+def _conditional_headers(headers, meta):
+    headers = dict(headers)
+    if meta:
+        if 'ETag' in meta['headers']:
+            headers['If-None-Match'] = meta['headers']['ETag']
+        if 'Last-Modified' in meta['headers']:
+            headers['If-Modified-Since'] = meta['headers']['Last-Modified']
+    return headers
+
+
+def cached_get(url, headers=None, params=None, timeout=timeout):
+    """
+    GET a GitHub REST URL through the shared rate-limit governor, revalidating
+    against the on-disk cache. Returns a requests.Response; `response.from_cache`
+    is True when the body was served from disk after a 304.
+    """
+    entry = {'key': None, 'meta': None, 'body': None}
+
+    def send(request_headers):
+        if cache_enabled:
+            # The governor picks the token, and the cache entry depends on it
+            entry['key'] = _cache_key(url, request_headers, params)
+            entry['meta'], entry['body'] = _load_entry(entry['key'])
+            request_headers = _conditional_headers(request_headers, entry['meta'])
+        return session.get(url, headers=request_headers, params=params, timeout=timeout)
+
+    # The search API has its own, much smaller budget
+    resource = 'search' if '/search/' in url else 'core'
+    response = governed_request(send, headers, key=url, resource=resource)
+
+    if response.status_code == 304 and entry['meta']:
+        logging.debug(f"Cache hit (304) for {url}")
+        return _replay(response, entry['meta'], entry['body'])
+
+    response.from_cache = False
+    if cache_enabled and response.status_code == 200 and ('ETag' in response.headers or 'Last-Modified' in response.headers):
+        try:
+            _store_entry(entry['key'], url, response)
+        except OSError as e:
+            logging.warning(f"Failed to write cache entry for {url}. Error: {e}")
+    return response
@@ -0,0 +1,193 @@
+import logging
+import os
+import threading
+import time
+import zlib
+from dotenv import load_dotenv
+
+# Shared, thread-safe GitHub rate-limit governor.
+# Every GitHub request goes through `governor.acquire()` to pick a token and
+# `governor.update()` to feed back the X-RateLimit-* / Retry-After headers.
+# Requests are spread over a pool of tokens (GITHUB_TOKENS='tok1,tok2' in .env),
+# paced once a token runs low, and a token that hits a primary or secondary
+# limit is parked until it may be used again instead of sleeping in whichever
+# worker thread happened to see the response. Budgets are tracked per token and
+# per X-RateLimit-Resource (REST 'core', 'graphql', 'search'), and GitHub's own
+# remaining count is trusted on every response, so free 304s do not drain it.
+
+load_dotenv()  # take environment variables from .env
+
+default_limit = 5000  # Requests per hour for a personal access token
+reserve = 20  # Requests kept in hand per token
+pace_below = 0.2  # Start spreading requests evenly once this fraction of the limit is left
+secondary_limit_backoff = 60  # GitHub asks to wait at least a minute when no Retry-After is given
+max_retries = 5
+
+
+def canonical(authorization):
+    """
+    GitHub takes a token as "token <pat>" or "Bearer <pat>"; map both to one
+    "Bearer <pat>" value so a token is one pool member with one budget.
+    """
+    scheme, _, value = (authorization or '').partition(' ')
+    if value and scheme.lower() in ('token', 'bearer'):
+        return f"Bearer {value.strip()}"
+    return authorization
+
+
+class TokenState:
+    def __init__(self, authorization, resource):
+        self.authorization = authorization
+        self.resource = resource
+        self.limit = default_limit
+        self.remaining = None  # Unknown until the first response
+        self.in_flight = 0  # Requests sent but not answered yet
+        self.reset = 0
+        self.blocked_until = 0
+        self.next_slot = 0
+
+    def available(self):
+        # Requests left once the ones still in flight are answered, None while unknown
+        return self.remaining - self.in_flight if self.remaining is not None else None
+
+    def wait_time(self, now):
+        """
+        Seconds until this token may send its next request.
+        """
+        if self.blocked_until > now:
+            return self.blocked_until - now
+        available = self.available()
+        if available is not None and available <= reserve and self.reset > now:
+            return self.reset - now
+        return max(self.next_slot - now, 0)
+
+
+class RateLimitGovernor:
+    def __init__(self, tokens=None):
+        self.lock = threading.Lock()
+        self.tokens = []
+        self.states = {}  # (authorization, resource) -> TokenState, as REST, GraphQL and search have separate budgets
+        for token in tokens or []:
+            self.register(f"Bearer {token}")
+
+    def register(self, authorization):
+        # Callers hold the lock or are still constructing the governor
+        if authorization and authorization not in self.tokens:
+            self.tokens.append(authorization)
+
+    def _state(self, authorization, resource):
+        # Callers hold the lock
+        if (authorization, resource) not in self.states:
+            self.states[(authorization, resource)] = TokenState(authorization, resource)
+        return self.states[(authorization, resource)]
+
+    def _pick(self, key, resource, now):
+        # Stick to the same token for the same URL so per-token ETags keep matching,
+        # unless that token has to wait and another one does not
+        states = [self._state(authorization, resource) for authorization in self.tokens]
+        preferred = states[zlib.crc32(key.encode()) % len(states)] if key else None
+        if preferred and preferred.wait_time(now) == 0:
+            return preferred
+        return min(states, key=lambda s: (s.wait_time(now), -(s.available() if s.remaining is not None else s.limit)))
+
+    def acquire(self, authorization=None, key=None, resource='core'):
+        """
+        Block until a token may be used for a request against the `resource` budget
+        ('core' for REST, 'graphql', 'search') and return its Authorization header value.
+        `authorization` (the caller's own header) joins the pool the first time it is seen.
+        Every acquire is matched by an update() or release() with the same resource.
+        """
+        authorization = canonical(authorization)
+        while True:
+            with self.lock:
+                self.register(authorization)
+                if not self.tokens:
+                    return authorization
+                now = time.time()
+                state = self._pick(key, resource, now)
+                wait = state.wait_time(now)
+                if wait == 0:
+                    # Count requests in flight so concurrent callers see the drain before GitHub reports it
+                    state.in_flight += 1
+                    available = state.available()
+                    if available is not None and available < state.limit * pace_below and state.reset > now:
+                        interval = (state.reset - now) / max(available - reserve, 1)
+                        state.next_slot = max(state.next_slot, now) + interval
+                    return state.authorization
+            logging.info(f"All GitHub tokens are rate limited for {resource}, waiting {wait:.1f} seconds.")
+            time.sleep(min(wait, 60))
+
+    def release(self, authorization, resource='core'):
+        """
+        Give back the slot of a request that got no response.
+        """
+        authorization = canonical(authorization)
+        with self.lock:
+            state = self.states.get((authorization, resource))
+            if state is not None and state.in_flight:
+                state.in_flight -= 1
+
+    def update(self, authorization, response, resource='core'):
+        """
+        Record the rate-limit headers of a response. Returns True when the request
+        was rejected by a primary or secondary rate limit and should be retried.
+        """
+        headers = response.headers
+        authorization = canonical(authorization)
+        with self.lock:
+            if authorization not in self.tokens:
+                return False
+            acquired = self._state(authorization, resource)
+            if acquired.in_flight:
+                acquired.in_flight -= 1
+            # GitHub names the budget a response counted against, which wins over the caller's guess
+            state = self._state(authorization, headers.get('X-RateLimit-Resource', resource))
+            now = time.time()
+            if 'X-RateLimit-Remaining' in headers and 'X-RateLimit-Reset' in headers:
+                # GitHub's count is authoritative, including for requests it did not charge (304s);
+                # the requests still in flight are subtracted when the count is used
+                state.remaining = int(headers['X-RateLimit-Remaining'])
+                state.reset = max(state.reset, int(headers['X-RateLimit-Reset']))
+                state.limit = int(headers.get('X-RateLimit-Limit', state.limit))
+
+            if response.status_code not in (403, 429):
+                return False
+            if 'Retry-After' in headers:
+                blocked_until = now + int(headers['Retry-After'])
+            elif headers.get('X-RateLimit-Remaining') == '0':
+                state.blocked_until = state.reset  # Only this budget is used up
+                blocked_until = None
+            elif 'rate limit' in response.text.lower():
+                blocked_until = now + secondary_limit_backoff
+            else:
+                return False  # A real permission error
+            if blocked_until is not None:
+                # Secondary limits apply to the token as a whole
+                for other in self.states.values():
+                    if other.authorization == authorization:
+                        other.blocked_until = max(other.blocked_until, blocked_until)
+            logging.warning(f"GitHub {state.resource} rate limit hit (HTTP {response.status_code}), "
+                            f"parking token for {state.blocked_until - now:.0f} seconds.")
+            return True
+
+
+def governed_request(send, headers, key=None, resource='core'):
+    """
+    Run `send(headers)` under the governor, retrying requests that were rate limited.
+    """
+    headers = dict(headers or {})
+    for _ in range(max_retries):
+        authorization = governor.acquire(headers.get('Authorization'), key=key, resource=resource)
+        if authorization:
+            headers['Authorization'] = authorization
+        try:
+            response = send(headers)
+        except Exception:
+            governor.release(authorization, resource)
+            raise
+        if not governor.update(authorization, response, resource):
+            break
+    return response
+
+
+governor = RateLimitGovernor([token.strip() for token in os.getenv('GITHUB_TOKENS', '').split(',') if token.strip()])
@@ -0,0 +1,168 @@
+import logging
+import time
+import requests
+from github_graphql import graphql, quote, GraphQLError
+from commit_watermarks import since_params
+
+# GraphQL multi-repo batched commit history fetcher.
+# Each query pulls `history(first: 100, after: ...)` of the default branch for up
+# to `batch_size` repositories at once through aliases (r0, r1, ...). Every alias
+# keeps its own cursor; repositories leave the batch as soon as their history is
+# exhausted and waiting repositories take their slot. Rows are handed out page
+# by page, and `on_done` says whether a repository's history completed. When
+# GitHub gives up on a query (502/504 or a timeout), half of the batch goes back
+# to the queue and the query is retried with the smaller batch.
+
+default_batch_size = 25
+max_attempts = 3  # Tries per repository once the batch is down to a single repository
+
+history_fields = '''
+pageInfo { hasNextPage endCursor }
+nodes {
+    oid
+    message
+    committedDate
+    committer { name date }
+    author { name email date user { login } }
+}
+'''
+
+
+class RepoCursor:
+    def __init__(self, repo, watermarks):
+        self.owner = repo['owner']
+        self.name = repo['name']
+        self.full_name = f"{self.owner}/{self.name}"
+        self.since, self.stop_sha = since_params(watermarks, self.full_name)
+        self.after = None
+        self.newest = None
+        self.attempts = 0
+
+
+def commit_row(repo_full_name, node):
+    """
+    Flatten a history node into the row format of commit_history.csv.
+    """
+    return {
+        "Repo Name": repo_full_name,
+        "Commit": node["oid"],
+        "Commit Message": node["message"],
+        "Commit Date": node["committer"]["date"] or node["committedDate"],
+        "Commit Owner": node["committer"]["name"],
+        "Commit Author": node["author"]["name"],
+        "Author Email": node["author"]["email"],
+        "Author Login": node["author"]["user"]["login"] if node["author"]["user"] else None
+    }
+
+
+def transient(error):
+    # Errors that a smaller query or a second try can get past
+    if isinstance(error, (requests.exceptions.Timeout, requests.exceptions.ConnectionError)):
+        return True
+    return (isinstance(error, requests.exceptions.HTTPError) and error.response is not None
+            and error.response.status_code in (502, 503, 504))
+
+
+def build_query(batch):
+    aliases = []
+    for alias, cursor in batch.items():
+        arguments = ['first: 100']
+        if cursor.after:
+            arguments.append(f'after: {quote(cursor.after)}')
+        if cursor.since:
+            arguments.append(f'since: {quote(cursor.since)}')
+        aliases.append(f'''
+        {alias}: repository(owner: {quote(cursor.owner)}, name: {quote(cursor.name)}) {{
+            defaultBranchRef {{
+                target {{
+                    ... on Commit {{
+                        history({', '.join(arguments)}) {{ {history_fields} }}
+                    }}
+                }}
+            }}
+        }}''')
+    return 'query {' + ''.join(aliases) + '\n}'
+
+
+def fetch_commit_history_graphql(repo_list, headers, on_rows, on_done=None, watermarks=None, batch_size=default_batch_size):
+    """
+    Fetch the default-branch history of every repository in `repo_list`, calling
+    `on_rows(repo_full_name, rows)` for each page and `on_done(repo_full_name, complete,
+    newest_row)` once a repository's history has ended. Returns
+    {repo_full_name: (complete, newest_row)} like AsyncCommitHarvester.run.
+    """
+    pending = [RepoCursor(repo, watermarks or {}) for repo in reversed(repo_list)]
+    batch = {}
+    results = {}
+    next_alias = 0
+
+    def finish(cursor, complete):
+        newest = cursor.newest if complete else None
+        results[cursor.full_name] = (complete, newest)
+        if on_done:
+            on_done(cursor.full_name, complete, newest)
+
+    while pending or batch:
+        # Top the batch up with waiting repositories
+        while pending and len(batch) < batch_size:
+            batch[f"r{next_alias}"] = pending.pop()
+            next_alias += 1
+
+        try:
+            data, errors = graphql(build_query(batch), headers)
+        except (requests.exceptions.RequestException, GraphQLError) as e:
+            if transient(e) and len(batch) > 1:
+                # Cursors keep their place, so the repositories put back resume where they were
+                aliases = list(batch)
+                for alias in reversed(aliases[len(aliases) // 2:]):
+                    pending.append(batch.pop(alias))
+                batch_size = len(batch)
+                logging.warning(f"GraphQL commit history query failed ({e}), retrying with {batch_size} repositories per query")
+                continue
+            cursor = next(iter(batch.values()))
+            cursor.attempts += 1
+            if transient(e) and cursor.attempts < max_attempts:
+                logging.warning(f"GraphQL commit history query for {cursor.full_name} failed ({e}), retrying")
+                time.sleep(2 ** cursor.attempts)
+                continue
+            logging.error(f"Error retrieving commit history for {', '.join(c.full_name for c in batch.values())}: {e}")
+            for cursor in batch.values():
+                finish(cursor, False)
+            batch = {}
+            continue
+
+        failed_aliases = {error['path'][0] for error in errors if error.get('path')}
+        for alias, cursor in list(batch.items()):
+            repository = data.get(alias)
+            if alias in failed_aliases or repository is None:
+                logging.error(f"Error retrieving commit history for {cursor.full_name}")
+                finish(cursor, False)
+                del batch[alias]
+                continue
+
+            branch = repository['defaultBranchRef']
+            if branch is None:  # Empty repository
+                finish(cursor, True)
+                del batch[alias]
+                continue
+
+            history = branch['target']['history']
+            rows = []
+            reached_known_sha = False
+            for node in history['nodes']:
+                if node['oid'] == cursor.stop_sha:
+                    reached_known_sha = True
+                    break
+                rows.append(commit_row(cursor.full_name, node))
+            if cursor.newest is None and rows:
+                cursor.newest = rows[0]
+            on_rows(cursor.full_name, rows)
+
+            if history['pageInfo']['hasNextPage'] and not reached_known_sha:
+                cursor.after = history['pageInfo']['endCursor']
+            else:
+                logging.info(f"Completed commit history retrieval for {cursor.full_name}.")
+                finish(cursor, True)
+                del batch[alias]
+
+    return results
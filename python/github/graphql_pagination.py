@@ -0,0 +1,116 @@
+import logging
+import threading
+import time
+import requests
+from datetime import datetime, timezone
+from github_graphql import graphql, GraphQLError
+
+# Cost-aware pagination of GitHub GraphQL connections.
+# Paged queries select `rateLimit { cost remaining resetAt limit }` next to the
+# connection. A PointBudget shared by all paginators of a run spreads the points
+# that are left over the time until the reset, instead of sleeping a fixed
+# interval between pages. A PageSizer per connection grows or shrinks `first`
+# from the point cost and latency of the pages seen so far, so wide nested
+# pages stay under GitHub's 10 second query timeout.
+
+reserve = 100  # Points kept in hand for other scripts sharing the token
+pace_below = 0.5  # Start spacing queries once less than this fraction of the limit is left
+target_latency = 4.0  # Seconds; GitHub aborts queries after 10
+max_page_cost = 50  # Points one page may cost before it is shrunk
+
+
+def parse_reset(value):
+    return datetime.strptime(value, '%Y-%m-%dT%H:%M:%SZ').replace(tzinfo=timezone.utc).timestamp() if value else 0
+
+
+class PointBudget:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.limit = None
+        self.remaining = None  # Unknown until the first response
+        self.reset_at = 0
+        self.next_slot = 0
+        self.spent = 0
+
+    def update(self, rate_limit):
+        with self.lock:
+            self.spent += rate_limit['cost']
+            self.limit = rate_limit.get('limit', self.limit)
+            self.remaining = rate_limit['remaining']
+            self.reset_at = parse_reset(rate_limit['resetAt'])
+
+    def wait(self, cost):
+        """
+        Block until a query of about `cost` points fits the budget.
+        """
+        with self.lock:
+            now = time.time()
+            delay = 0
+            if self.remaining is not None and self.reset_at > now:
+                if self.remaining - cost < reserve:
+                    # Out of points: nothing to spread, wait for the reset
+                    delay = self.reset_at - now + 1
+                elif self.limit and self.remaining < self.limit * pace_below:
+                    # Space queries so the points left last until the reset
+                    spacing = (self.reset_at - now) / max(1, (self.remaining - reserve) / max(cost, 1))
+                    slot = max(now, self.next_slot)
+                    self.next_slot = slot + spacing
+                    delay = slot - now
+        if delay > 1:
+            logging.info(f"GraphQL budget at {self.remaining} points, waiting {delay:.0f}s")
+        if delay > 0:
+            time.sleep(delay)
+
+
+class PageSizer:
+    def __init__(self, initial=50, minimum=5, maximum=100):
+        self.size = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.cost = 1  # Cost of the last page, used to reserve budget for the next one
+
+    def observe(self, cost, latency):
+        self.cost = cost
+        if latency > target_latency or cost > max_page_cost:
+            self.shrink()
+        elif latency < target_latency / 2 and cost * 2 <= max_page_cost:
+            self.size = min(self.maximum, self.size + max(1, self.size // 2))
+
+    def shrink(self):
+        self.size = max(self.minimum, self.size // 2)
+
+
+def paginate(query, variables, path, headers, budget, sizer=None, execute=graphql):
+    """
+    Yield (connection, errors) for every page of the connection found at `path`
+    (a tuple of keys into `data`). The query takes `$first: Int!` and
+    `$after: String` for that connection and selects
+    `rateLimit { cost remaining resetAt limit }`.
+    """
+    sizer = sizer or PageSizer()
+    after = None
+    while True:
+        budget.wait(sizer.cost)
+        started = time.monotonic()
+        try:
+            data, errors = execute(query, headers, {**variables, 'first': sizer.size, 'after': after})
+        except requests.exceptions.HTTPError as e:
+            # A 502 is GitHub giving up on a query that took too long; retry with a smaller page
+            if e.response is not None and e.response.status_code in (502, 504) and sizer.size > sizer.minimum:
+                sizer.shrink()
+                logging.warning(f"GraphQL page timed out, retrying with {sizer.size} nodes per page")
+                continue
+            raise
+        if data.get('rateLimit'):
+            budget.update(data['rateLimit'])
+            sizer.observe(data['rateLimit']['cost'], time.monotonic() - started)
+
+        connection = data
+        for key in path:
+            connection = connection.get(key) if connection else None
+        if connection is None:
+            raise GraphQLError("; ".join(error.get('message', str(error)) for error in errors) or f"No {'.'.join(path)} in response")
+        yield connection, errors
+        if not connection['pageInfo']['hasNextPage']:
+            return
+        after = connection['pageInfo']['endCursor']
@@ -3,11 +3,13 @@ import requests
 import pandas as pd
 import logging
 import queue
-import time
 from dotenv import load_dotenv
 import os
 from concurrent.futures import ThreadPoolExecutor
-from time import sleep
+from github_http_cache import cached_get
+from repo_index import RepoIndex
+from github_graphql import graphql, quote, GraphQLError
+from blob_store import BlobStore
 
 # Define the names of organizations to analyze and your API key
 load_dotenv()  # take environment variables from .env.
@@ -16,6 +18,12 @@ org_names = ['example1', 'example2']
 outputfile = 'cicd_report.xlsx'
 # Set this to true if you want to download and save CI/CD configuration files
 dump_cicd_configs = True
+# Downloaded config files are stored once per git blob and hard-linked into each repo's folder
+blob_store = BlobStore(os.getenv('CICD_BLOB_STORE', '.cicd_blobs'), max_workers=8)
+# 'graphql' checks every config path of `detection_batch_size` repos in one query,
+# 'rest' makes one contents request per tool per repo
+detection_mode = os.getenv('CICD_DETECTION_MODE', 'graphql')  # 'graphql' or 'rest' in .env
+detection_batch_size = 50
 
 # Set up logging configuration
 logging.basicConfig(level=logging.INFO)
@@ -28,9 +36,9 @@ headers = {'Authorization': f'token {api_key}'}
 # Initialize a queue to store results
 row_queue = queue.Queue()
 
-# Initialize GitHub API rate limit and reset time
-rate_limit_remaining = 5000
-rate_limit_reset = time.time()
+# Shared repo metadata index; results of unchanged repos are reused from it
+repo_index = RepoIndex()
+index_consumer = 'cicd_report'
 
 # Define CI/CD tools and their respective configuration file paths
 tools = {
@@ -41,70 +49,38 @@ tools = {
     "Bamboo": "bamboo-specs/bamboo.yml",
 }
 
-# Function to update GitHub API rate limit and sleep if needed
-
-
-def update_rate_limit(response):
-    global rate_limit_remaining, rate_limit_reset
-    if 'X-RateLimit-Remaining' in response.headers and 'X-RateLimit-Reset' in response.headers:
-        rate_limit_remaining = int(response.headers['X-RateLimit-Remaining'])
-        rate_limit_reset = int(response.headers['X-RateLimit-Reset'])
-        if rate_limit_remaining < 20:
-            sleep_time = max(rate_limit_reset - time.time(), 0)
-            if sleep_time > 0:
-                logging.info(
-                    f"Rate limit close to being exceeded, sleeping for {sleep_time} seconds.")
-                sleep(sleep_time)
-
 # Function to process each repo and identify the CI/CD tool used, based on the presence of certain config files
 
 
-def process_repo(repo, index, total_repos):
+def process_repo(repo, index, total_repos, repo_tools=tools):
     logging.info(f"Starting processing of repo: {repo['name']}")
     try:
         repo_name = repo['name']
         detected_tools = []
         base_contents_url = repo['contents_url'].replace("{+path}", "")
         permission_denied = False
+        # (blob sha, download url, destination) of every config file to save
+        config_files = []
 
-        for tool, config_file in tools.items():
+        for tool, config_file in repo_tools.items():
             logging.info(f"Checking for {tool} in {repo_name}")
             tool_url = base_contents_url + config_file
-            response = requests.get(tool_url, headers=headers, timeout=(5, 14))
-            update_rate_limit(response)
+            response = cached_get(tool_url, headers=headers, timeout=(5, 14))
 
             # Add the CI/CD tool to detected_tools list if its config file is found
             # If dump_cicd_configs is True, download the config files as well
             if response.status_code == 200:
                 detected_tools.append(tool)
                 if dump_cicd_configs:
-                    os.makedirs(tool, exist_ok=True)
                     if tool == "GitHub Actions":  # For GitHub Actions, download all files in the workflow directory
-                        config_files = response.json()
-                        for config in config_files:
-                            download_url = config['download_url']
-                            file_name = os.path.join(
-                                tool, repo_name, config['name'])
-                            os.makedirs(os.path.dirname(
-                                file_name), exist_ok=True)
-                            with requests.get(download_url, stream=True) as r:
-                                r.raise_for_status()
-                                with open(file_name, 'wb') as f:
-                                    for chunk in r.iter_content(chunk_size=8192):
-                                        f.write(chunk)
-                            logging.info(
-                                f"Config file {file_name} downloaded.")
+                        for config in response.json():
+                            if config['type'] == 'file':
+                                config_files.append((config['sha'], config['download_url'],
+                                                     os.path.join(tool, repo_name, config['name'])))
                     else:  # For other tools, download the single config file
-                        download_url = response.json()['download_url']
-                        file_name = os.path.join(
-                            tool, repo_name, os.path.basename(config_file))
-                        os.makedirs(os.path.dirname(file_name), exist_ok=True)
-                        with requests.get(download_url, stream=True) as r:
-                            r.raise_for_status()
-                            with open(file_name, 'wb') as f:
-                                for chunk in r.iter_content(chunk_size=8192):
-                                    f.write(chunk)
-                        logging.info(f"Config file {file_name} downloaded.")
+                        config = response.json()
+                        config_files.append((config['sha'], config['download_url'],
+                                             os.path.join(tool, repo_name, os.path.basename(config_file))))
 
             # Handle error codes from GitHub API
             elif response.status_code == 403:
@@ -120,6 +96,10 @@ def process_repo(repo, index, total_repos):
                 logging.error(
                     f"Error checking for {tool} in {repo_name}: HTTP {response.status_code}")
 
+        # Blobs already in the store are only linked, the rest download concurrently
+        if config_files:
+            blob_store.materialize(config_files)
+
         # Add the result to the queue
         if permission_denied:
             cicd_tool = "Permission Denied"
@@ -133,46 +113,98 @@ def process_repo(repo, index, total_repos):
         logging.error(
             f"An error occurred while processing the repo {repo_name}: {str(e)}")
 
+# Function to detect the CI/CD tools of a batch of repos with one GraphQL query,
+# using an aliased `object(expression: "HEAD:<path>")` lookup per config file
+
+
+def detect_tools_batch(repos):
+    tool_names = list(tools)
+    aliases = []
+    for i, repo in enumerate(repos):
+        lookups = ' '.join(
+            f't{j}: object(expression: {quote("HEAD:" + tools[tool])}) {{ oid }}' for j, tool in enumerate(tool_names))
+        aliases.append(
+            f"r{i}: repository(owner: {quote(repo['owner']['login'])}, name: {quote(repo['name'])}) {{ {lookups} }}")
+    data, errors = graphql('query { ' + ' '.join(aliases) + ' }', headers)
+
+    forbidden = {error['path'][0] for error in errors if error.get('path') and error.get('type') == 'FORBIDDEN'}
+    for i, repo in enumerate(repos):
+        alias = f"r{i}"
+        repository = data.get(alias)
+        if alias in forbidden:
+            logging.error(f"Permission denied checking {repo['name']}. Check your API token.")
+            row_queue.put([repo['name'], "Permission Denied"])
+            continue
+        if repository is None:
+            logging.error(f"Error checking for CI/CD tools in {repo['name']}")
+            continue
+
+        detected = {tool: tools[tool] for j, tool in enumerate(tool_names) if repository[f"t{j}"] is not None}
+        if detected and dump_cicd_configs:
+            # Only the config files that exist are fetched over REST for download
+            process_repo(repo, i, len(repos), repo_tools=detected)
+        else:
+            row_queue.put([repo['name'], ", ".join(detected) if detected else "Unknown"])
+            logging.info(f"Finished processing of repo: {repo['name']}")
+
+
+def detect_tools_graphql(org_name, repos):
+    batches = [repos[i:i + detection_batch_size] for i in range(0, len(repos), detection_batch_size)]
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = {executor.submit(detect_tools_batch, batch): index for index, batch in enumerate(batches, start=1)}
+        for future, index in futures.items():
+            try:
+                future.result()
+                logging.info(
+                    f"Checked batch {index} out of {len(batches)} for organization {org_name}. Progress: {index}/{len(batches)}")
+            except (requests.exceptions.RequestException, GraphQLError) as e:
+                logging.error(
+                    f"An error occurred while checking batch {index} of {org_name}: {str(e)}")
+
 # Function to get information about all repositories of an organization
 
 
 def get_repo_info(org_name):
-    page = 1
-    repos = []
-    while True:
-        url = f"https://api.github.com/orgs/{org_name}/repos?page={page}&per_page=100"
-        try:
-            response = requests.get(url, headers=headers)
-            update_rate_limit(response)
-            response_json = response.json()
-            if 'message' in response_json:
-                if response_json['message'] == "Not Found":
-                    logging.error(f"Organization {org_name} not found.")
-                elif response_json['message'] == "Forbidden":
-                    logging.error("Permission denied. Check your API token.")
-                elif response_json['message'] == "You have triggered an abuse detection mechanism. Please wait a few minutes before you try again.":
-                    logging.error(
-                        "Rate limit exceeded while getting repos. Please slow down your requests.")
-                return
-            elif response_json:
-                repos.extend(response_json)
-                page += 1
-            else:
-                break
-        except Exception as e:
+    # Refresh the shared repo index and only check the repos pushed to since the last report
+    try:
+        repo_index.refresh(org_name, headers)
+    except requests.exceptions.HTTPError as e:
+        if e.response.status_code == 404:
+            logging.error(f"Organization {org_name} not found.")
+        elif e.response.status_code == 403:
+            logging.error("Permission denied. Check your API token.")
+        else:
             logging.error(
                 f"An error occurred while getting the repos: {str(e)}")
-            return
+        return
+    except Exception as e:
+        logging.error(
+            f"An error occurred while getting the repos: {str(e)}")
+        return
+    repos, pushed_watermark = repo_index.changed_since_last_run(org_name, index_consumer)
+    logging.info(f"{len(repos)} repositories of {org_name} changed since the last report.")
+
+    if detection_mode == 'graphql':
+        detect_tools_graphql(org_name, repos)
+    else:
+        # Process each repository using a ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            for index, repo in enumerate(repos, start=1):
+                executor.submit(process_repo, repo, index, len(repos))
+                logging.info(
+                    f"Processing {index} out of {len(repos)} repositories for organization {org_name}. Progress: {index}/{len(repos)}")
 
-    # Process each repository using a ThreadPoolExecutor
-    with ThreadPoolExecutor(max_workers=2) as executor:
-        for index, repo in enumerate(repos, start=1):
-            executor.submit(process_repo, repo, index, len(repos))
-            logging.info(
-                f"Processing {index} out of {len(repos)} repositories for organization {org_name}. Progress: {index}/{len(repos)}")
+    # Keep this run's results, then report every repo including the unchanged ones
+    results = {}
+    while not row_queue.empty():
+        repo_name, cicd_tool = row_queue.get()
+        results[repo_name] = cicd_tool
+    repo_index.save_results(org_name, index_consumer, results)
+    repo_index.mark_run(org_name, index_consumer, pushed_watermark,
+                        failed=[repo['name'] for repo in repos if repo['name'] not in results])
 
     # Write the results to an Excel file
-    rows = list(row_queue.queue)
+    rows = list(repo_index.results(org_name, index_consumer).items())
     df = pd.DataFrame(rows, columns=["Repo Name", "CI/CD Tool"])
     df.to_excel(f'{org_name}_{outputfile}', index=False)
     logging.info(f"Output successfully written to {org_name}_{outputfile}")
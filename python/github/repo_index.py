@@ -0,0 +1,165 @@
+import json
+import logging
+import os
+import sqlite3
+import time
+from dotenv import load_dotenv
+from github_http_cache import cached_get
+
+# Local SQLite index of organization repository metadata shared by the GitHub scripts.
+# The index is refreshed incrementally from the org listing sorted by last push:
+# paging stops at the first page that reaches a push the index has already
+# seen. Every few days a full listing also picks up metadata-only changes
+# (archived, default branch) and drops deleted repositories.
+# Scripts record when they last consumed an org, so they can ask for just the
+# repositories pushed to since their previous run.
+
+load_dotenv()  # take environment variables from .env
+index_path = os.getenv('GITHUB_REPO_INDEX', 'repo_index.sqlite')
+github_api_url = "https://api.github.com"
+full_refresh_interval = 7 * 24 * 3600  # Seconds between full listings
+
+schema = '''
+CREATE TABLE IF NOT EXISTS repos (
+    org TEXT NOT NULL,
+    name TEXT NOT NULL,
+    pushed_at TEXT,
+    updated_at TEXT,
+    default_branch TEXT,
+    size INTEGER,
+    archived INTEGER,
+    data TEXT NOT NULL,
+    PRIMARY KEY (org, name)
+);
+CREATE TABLE IF NOT EXISTS refreshes (
+    org TEXT PRIMARY KEY,
+    last_full_refresh REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS consumers (
+    consumer TEXT NOT NULL,
+    org TEXT NOT NULL,
+    pushed_watermark TEXT NOT NULL,
+    PRIMARY KEY (consumer, org)
+);
+CREATE TABLE IF NOT EXISTS retries (
+    consumer TEXT NOT NULL,
+    org TEXT NOT NULL,
+    name TEXT NOT NULL,
+    PRIMARY KEY (consumer, org, name)
+);
+CREATE TABLE IF NOT EXISTS results (
+    consumer TEXT NOT NULL,
+    org TEXT NOT NULL,
+    name TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (consumer, org, name)
+);
+'''
+
+
+class RepoIndex:
+    def __init__(self, path=index_path):
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(schema)
+
+    def close(self):
+        self.conn.close()
+
+    def _newest_pushed_at(self, org_name):
+        row = self.conn.execute('SELECT MAX(pushed_at) FROM repos WHERE org = ?', (org_name,)).fetchone()
+        return row[0]
+
+    def refresh(self, org_name, headers):
+        """
+        Bring the index for an organization up to date. Raises requests exceptions
+        when the listing fails, leaving the index as it was.
+        """
+        row = self.conn.execute('SELECT last_full_refresh FROM refreshes WHERE org = ?', (org_name,)).fetchone()
+        full = row is None or time.time() - row[0] > full_refresh_interval
+        newest_known = None if full else self._newest_pushed_at(org_name)
+        started = time.time()
+
+        seen = []
+        page = 1
+        while True:
+            response = cached_get(f"{github_api_url}/orgs/{org_name}/repos", headers=headers,
+                                  params={'sort': 'pushed', 'direction': 'desc', 'per_page': 100, 'page': page})
+            response.raise_for_status()
+            repos = response.json()
+            if not repos:
+                break
+            seen.extend(repos)
+            # Sorted by push: once a page reaches a push the index already has, the rest is unchanged too
+            if newest_known and (repos[-1]['pushed_at'] or '') <= newest_known:
+                break
+            page += 1
+
+        with self.conn:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO repos (org, name, pushed_at, updated_at, default_branch, size, archived, data) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                [(org_name, repo['name'], repo['pushed_at'], repo['updated_at'], repo['default_branch'],
+                  repo['size'], int(repo['archived']), json.dumps(repo)) for repo in seen])
+            if full:
+                # A full listing is authoritative, drop repositories that no longer exist
+                names = {repo['name'] for repo in seen}
+                indexed = {name for (name,) in self.conn.execute('SELECT name FROM repos WHERE org = ?', (org_name,))}
+                self.conn.executemany('DELETE FROM repos WHERE org = ? AND name = ?',
+                                      [(org_name, name) for name in indexed - names])
+                self.conn.execute('INSERT OR REPLACE INTO refreshes (org, last_full_refresh) VALUES (?, ?)',
+                                  (org_name, started))
+        logging.info(f"Refreshed repo index for {org_name}: {len(seen)} listed ({'full' if full else 'incremental'}).")
+
+    def repos(self, org_name):
+        """
+        Return the listing entries of every indexed repository of an organization.
+        """
+        rows = self.conn.execute('SELECT data FROM repos WHERE org = ? ORDER BY name', (org_name,))
+        return [json.loads(data) for (data,) in rows]
+
+    def changed_since_last_run(self, org_name, consumer):
+        """
+        Return the repositories pushed to since `consumer` last called mark_run for this
+        organization (all of them on its first run) plus the ones that run reported as
+        failed, and the watermark to pass to mark_run.
+        """
+        row = self.conn.execute('SELECT pushed_watermark FROM consumers WHERE consumer = ? AND org = ?',
+                                (consumer, org_name)).fetchone()
+        watermark = self._newest_pushed_at(org_name) or ''
+        if row is None:
+            return self.repos(org_name), watermark
+        rows = self.conn.execute(
+            'SELECT data FROM repos WHERE org = ? AND (pushed_at > ? OR name IN '
+            '(SELECT name FROM retries WHERE consumer = ? AND org = ?)) ORDER BY name',
+            (org_name, row[0], consumer, org_name))
+        return [json.loads(data) for (data,) in rows], watermark
+
+    def mark_run(self, org_name, consumer, watermark, failed=()):
+        """
+        Record that `consumer` has processed everything up to `watermark` except the
+        repository names in `failed`, which the next run gets again.
+        """
+        with self.conn:
+            self.conn.execute('INSERT OR REPLACE INTO consumers (consumer, org, pushed_watermark) VALUES (?, ?, ?)',
+                              (consumer, org_name, watermark))
+            self.conn.execute('DELETE FROM retries WHERE consumer = ? AND org = ?', (consumer, org_name))
+            self.conn.executemany('INSERT OR REPLACE INTO retries (consumer, org, name) VALUES (?, ?, ?)',
+                                  [(consumer, org_name, name) for name in failed])
+
+    def save_results(self, org_name, consumer, results):
+        """
+        Keep a per-repository result (e.g. a report row) so unchanged repositories
+        can be reported without being processed again.
+        """
+        with self.conn:
+            self.conn.executemany('INSERT OR REPLACE INTO results (consumer, org, name, value) VALUES (?, ?, ?, ?)',
+                                  [(consumer, org_name, name, json.dumps(value)) for name, value in results.items()])
+
+    def results(self, org_name, consumer):
+        """
+        Return the stored results of the repositories that are still in the index.
+        """
+        rows = self.conn.execute(
+            'SELECT results.name, results.value FROM results JOIN repos ON repos.org = results.org AND repos.name = results.name '
+            'WHERE results.consumer = ? AND results.org = ? ORDER BY results.name', (consumer, org_name))
+        return {name: json.loads(value) for name, value in rows}
@@ -0,0 +1,161 @@
+import json
+import logging
+import os
+import queue
+import threading
+from datetime import datetime, timedelta, timezone
+
+# Date-range sharded search planner.
+# The search API stops after 1,000 results, so a query is split into `created:`
+# windows; any window that still reports 1,000 or more hits is halved until
+# every shard fits. Shards are walked concurrently by a small pool (requests
+# still go through the shared rate-limit governor), and each shard's cursor is
+# checkpointed after every page so an interrupted harvest resumes where it stopped.
+# Work a page hands off to run later (e.g. queued clones) is `hold`-ed in the same
+# checkpoint before the cursor moves past it and `release`-d once done, so a
+# resumed harvest can pick it up again from `held()`.
+
+search_cap = 1000
+date_format = '%Y-%m-%dT%H:%M:%SZ'
+one_second = timedelta(seconds=1)
+
+
+def parse_date(value):
+    return datetime.strptime(value, date_format).replace(tzinfo=timezone.utc)
+
+
+def format_date(value):
+    return value.strftime(date_format)
+
+
+class ShardedSearch:
+    def __init__(self, query, search_page, created_from, created_to, checkpoint_path, workers=4):
+        """
+        `search_page(query, after)` returns (nodes, repository_count, end_cursor or None
+        when the last page was reached) for one page of a search.
+        """
+        self.query = query
+        self.search_page = search_page
+        self.checkpoint_path = checkpoint_path
+        self.workers = workers
+        self.on_page = None
+        self.lock = threading.Lock()
+        self.held_items = {}
+        self.shards = self._load_checkpoint()
+        if not self.shards:
+            self.shards[self._key(created_from, created_to)] = {'after': None, 'state': 'pending'}
+
+    @staticmethod
+    def _key(start, end):
+        return f"{format_date(start)}..{format_date(end)}"
+
+    @staticmethod
+    def _window(key):
+        start, end = key.split('..')
+        return parse_date(start), parse_date(end)
+
+    def _load_checkpoint(self):
+        if not os.path.exists(self.checkpoint_path):
+            return {}
+        with open(self.checkpoint_path) as f:
+            checkpoint = json.load(f)
+        if checkpoint.get('query') != self.query:
+            logging.warning(f"Checkpoint {self.checkpoint_path} is for another query, starting over.")
+            return {}
+        self.held_items = checkpoint.get('held', {})
+        return checkpoint['shards']
+
+    def _save_checkpoint(self):
+        # Callers hold self.lock
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'query': self.query, 'shards': self.shards, 'held': self.held_items}, f, indent=4)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def _walk(self, key, work):
+        start, end = self._window(key)
+        shard_query = f"{self.query} created:{key}"
+        after = self.shards[key]['after']
+        while True:
+            nodes, count, end_cursor = self.search_page(shard_query, after)
+
+            if after is None and count >= search_cap and end > start:
+                # Too many hits for one shard: split the window in half and drop this page.
+                # Both ends of a created: range are inclusive, so the halves must not share a second
+                middle = start + timedelta(seconds=(end - start).total_seconds() // 2)
+                with self.lock:
+                    self.shards[key]['state'] = 'split'
+                    for child in (self._key(start, middle), self._key(middle + one_second, end)):
+                        self.shards[child] = {'after': None, 'state': 'pending'}
+                        work.put(child)
+                    self._save_checkpoint()
+                logging.info(f"Split shard {key} ({count} hits)")
+                return
+            if after is None and count >= search_cap:
+                logging.warning(f"Shard {key} still has {count} hits, only the first {search_cap} are reachable.")
+
+            self.on_page(nodes)
+            with self.lock:
+                self.shards[key]['after'] = end_cursor
+                if end_cursor is None:
+                    self.shards[key]['state'] = 'done'
+                self._save_checkpoint()
+            if end_cursor is None:
+                logging.info(f"Finished shard {key} ({count} hits)")
+                return
+            after = end_cursor
+
+    def hold(self, items):
+        """
+        Record {item_id: item} as handed off but not finished yet. Call from `on_page`,
+        so the items are checkpointed before the shard's cursor moves past their page.
+        """
+        if items:
+            with self.lock:
+                self.held_items.update(items)
+                self._save_checkpoint()
+
+    def release(self, item_id):
+        with self.lock:
+            if self.held_items.pop(item_id, None) is not None:
+                self._save_checkpoint()
+
+    def held(self):
+        """
+        Return the items a previous, interrupted run held but never released.
+        """
+        with self.lock:
+            return dict(self.held_items)
+
+    def run(self, on_page):
+        """
+        Walk every shard, calling `on_page(nodes)` from the worker threads for each page.
+        """
+        self.on_page = on_page
+        work = queue.Queue()
+        for key, shard in self.shards.items():
+            if shard['state'] == 'pending':
+                work.put(key)
+
+        def worker():
+            while True:
+                key = work.get()
+                if key is None:
+                    return
+                try:
+                    self._walk(key, work)
+                except Exception as e:
+                    # The shard stays pending in the checkpoint and is retried on the next run
+                    logging.error(f"Failed to walk shard {key}. Error: {e}")
+                finally:
+                    work.task_done()
+
+        threads = [threading.Thread(target=worker) for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        # Splits add shards while running, so wait for the queue to drain rather than the initial list
+        work.join()
+        for _ in threads:
+            work.put(None)
+        for thread in threads:
+            thread.join()
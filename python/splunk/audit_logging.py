@@ -0,0 +1,79 @@
+import atexit
+import itertools
+import logging
+import logging.handlers
+import queue
+import re
+
+# Logging setup for the security auditor.
+# Worker threads only put records on a queue; a background listener formats,
+# truncates, redacts and writes them, so log I/O never blocks a fetch or a send.
+# Records keep their %-style arguments until the listener formats them, so
+# callers should log immutable values. Request and response details go to the
+# `auditor.http` logger, which only keeps one record in `sample_every`.
+
+log_format = '%(asctime)s - %(levelname)s - %(message)s'
+max_message_length = 2000  # Longer messages are cut, with the original length noted
+
+# Credentials in headers or URLs: "Bearer <token>", "Splunk <token>", token=<token>
+secret_patterns = [
+    (re.compile(r'\b(Bearer|Splunk|token)\s+[^\s\'",}]{8,}', re.IGNORECASE), r'\1 [REDACTED]'),
+    (re.compile(r'\b(token|access_token|password)=[^\s&\'",}]+', re.IGNORECASE), r'\1=[REDACTED]'),
+]
+
+
+def redact(message):
+    for pattern, replacement in secret_patterns:
+        message = pattern.sub(replacement, message)
+    return message
+
+
+class RedactingFormatter(logging.Formatter):
+    def format(self, record):
+        message = record.getMessage()
+        if len(message) > max_message_length:
+            message = f"{message[:max_message_length]}... [truncated, {len(message)} chars]"
+        # Format a copy so other handlers still see the original record
+        record = logging.makeLogRecord({**record.__dict__, 'msg': redact(message), 'args': None})
+        return redact(super().format(record))
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Let through every warning and error, and one in `every` records below that.
+    """
+    def __init__(self, every):
+        super().__init__()
+        self.every = max(1, every)
+        self.counter = itertools.count()
+
+    def filter(self, record):
+        return record.levelno >= logging.WARNING or next(self.counter) % self.every == 0
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # The stock handler formats the message in the logging thread; leave that to the listener
+        return record
+
+
+def setup_logging(log_file, level=logging.INFO, sample_every=100):
+    """
+    Route the root logger through a queue to `log_file` and stderr, and sample
+    the `auditor.http` logger. The listener is flushed and stopped at exit.
+    """
+    formatter = RedactingFormatter(log_format)
+    handlers = [logging.FileHandler(log_file), logging.StreamHandler()]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    records = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(records, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    root = logging.getLogger()
+    root.handlers = [DeferredQueueHandler(records)]
+    root.setLevel(level)
+    logging.getLogger('auditor.http').addFilter(SamplingFilter(sample_every))
+    return listener
@@ -3,6 +3,8 @@ import os
 import argparse
 from dotenv import load_dotenv
 import splunklib.client as client
+from saved_search_cache import SavedSearchCache
+from splunk_probe import Credential, default_endpoints, load_credentials, load_endpoints, run_probe_matrix, write_matrix_report
 
 # Load environment variables from .env file
 load_dotenv()
@@ -13,6 +15,7 @@ logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %
 # Load Splunk host, port, and other configuration from environment variables
 splunk_host = os.getenv("SPLUNK_HOST")
 splunk_port = int(os.getenv("SPLUNK_PORT", "8089"))  # Default to 8089 if not provided
+splunk_scheme = os.getenv("SPLUNK_SCHEME", "https")
 # Load Splunk token from environment variable
 token = os.getenv("SPLUNK_TOKEN")
 
@@ -22,9 +25,38 @@ password = os.getenv("SPLUNK_PASSWORD")
 
 # Argument parsing
 parser = argparse.ArgumentParser(description="Fetch reports from Splunk API")
-parser.add_argument("--auth-method", choices=["token", "userpass"], required=True, help="Authentication method: token or userpass")
+parser.add_argument("--auth-method", choices=["token", "userpass"], help="Authentication method: token or userpass")
+parser.add_argument("--full", action="store_true", help="Fetch every saved search again instead of only those updated since the last run")
+parser.add_argument("--probe", action="store_true",
+                    help="Probe REST endpoints with every credential concurrently and report status and latency per endpoint and credential")
+parser.add_argument("--endpoints-file", help="Endpoints to probe, one path per line (default: a built-in list of common endpoints)")
+parser.add_argument("--credentials-file",
+                    help='JSON list of extra credentials to probe with, e.g. [{"name": "viewer", "username": "...", "password": "..."}]')
+parser.add_argument("--samples", type=int, default=5, help="Requests per endpoint and credential when probing")
+parser.add_argument("--workers", type=int, default=16, help="Concurrent probe requests")
+parser.add_argument("--report", default="probe_matrix.csv", help="CSV file the probe matrix is written to")
 args = parser.parse_args()
 
+if args.probe:
+    # The environment credentials (or only the one picked with --auth-method) plus any from --credentials-file
+    credentials = []
+    if token and args.auth_method in (None, "token"):
+        credentials.append(Credential("token", token=token))
+    if username and password and args.auth_method in (None, "userpass"):
+        credentials.append(Credential(username, username=username, password=password))
+    if args.credentials_file:
+        credentials.extend(load_credentials(args.credentials_file))
+    if not credentials:
+        logging.error("No Splunk credentials found in environment variables or the credentials file.")
+        exit(1)
+    endpoints = load_endpoints(args.endpoints_file) if args.endpoints_file else default_endpoints
+
+    results = run_probe_matrix(f"{splunk_scheme}://{splunk_host}:{splunk_port}", endpoints, credentials,
+                               samples=args.samples, workers=args.workers)
+    write_matrix_report(results, endpoints, credentials, args.report)
+    logging.info(f"Probe matrix written to {args.report}")
+    exit(0)
+
 if args.auth_method == "token":
     if token is None:
         logging.error("Splunk token not found in environment variables.")
@@ -34,7 +66,7 @@ elif args.auth_method == "userpass":
         logging.error("Splunk username or password not found in environment variables.")
         exit(1)
 else:
-    logging.error("Invalid authentication method specified.")
+    logging.error("Specify --auth-method token or userpass, or --probe.")
     exit(1)
 
 try:
@@ -42,16 +74,31 @@ try:
     service = client.connect(
         host=splunk_host,
         port=splunk_port,
+        scheme=splunk_scheme,
         token=token if args.auth_method == "token" else None,
         username=username if args.auth_method == "userpass" else None,
         password=password if args.auth_method == "userpass" else None,
     )
 
-    # Fetch the list of reports
-    saved_searches = service.saved_searches.list()
+    # One paged listing of names and update times; this report only needs the names,
+    # so the listing content is what gets cached and changed entries cost no extra requests
+    listed = {}
+    for saved_search in service.saved_searches.iter(f="title"):
+        access = saved_search.state.access or {}
+        stub = {"name": saved_search.name, "app": access.get("app", ""), "owner": access.get("owner", ""),
+                "updated": saved_search.state.updated}
+        listed[(stub["app"], stub["owner"], stub["name"])] = (stub, dict(saved_search.content))
+
+    def fetch_changed(changed):
+        return [{**stub, "content": listed[(stub["app"], stub["owner"], stub["name"])][1]} for stub in changed]
+
+    cache = SavedSearchCache()
+    namespace = f"{splunk_host}:{splunk_port}/{username if args.auth_method == 'userpass' else 'token'}"
+    cache.sync(namespace, [stub for stub, _ in listed.values()], fetch_changed, full=args.full)
 
-    for saved_search in saved_searches:
-        print("Report name:", saved_search.name)
+    for saved_search in cache.entries(namespace):
+        print("Report name:", saved_search["name"])
+    cache.close()
 
 except Exception as e:
     logging.error("An error occurred: %s", e)
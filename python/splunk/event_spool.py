@@ -0,0 +1,217 @@
+import json
+import logging
+import os
+import threading
+
+# Disk-backed, bounded spool between the auditor's GitHub fetchers and its sink.
+# Records are appended as JSON lines to numbered segment files; consumers read
+# batches in order and acknowledge them once the sink has accepted them. The
+# offset of the last contiguously acknowledged record is fsync'd to
+# `offsets.json`, and fully consumed segments are deleted. After a crash or a
+# sink outage, the next run resumes from that offset, so spooled events are not
+# lost and GitHub does not have to be crawled again. Producers block once
+# `max_bytes` of unacknowledged data is spooled.
+
+offsets_file = 'offsets.json'
+segment_prefix = 'segment-'
+segment_suffix = '.ndjson'
+
+
+class SpoolError(Exception):
+    """
+    Raised to producers once the consumer side has given up.
+    """
+
+
+class SpoolBatch:
+    def __init__(self, records, start, end, size):
+        self.records = records
+        self.start = start
+        self.end = end
+        self.size = size
+        self.acked = False
+
+
+class EventSpool:
+    def __init__(self, path, max_bytes=256 * 1024 * 1024, segment_bytes=16 * 1024 * 1024, fsync_every=1000):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.segment_bytes = segment_bytes
+        self.fsync_every = fsync_every
+        os.makedirs(path, exist_ok=True)
+
+        self.lock = threading.Lock()
+        self.not_full = threading.Condition(self.lock)
+        self.not_empty = threading.Condition(self.lock)
+        self.read_lock = threading.Lock()  # Serializes file reads between consumers
+        self.closed = False
+        self.failure = None
+        self.outstanding = []  # Batches handed to consumers, in read order
+        self.unsynced = 0
+
+        self.committed = self._load_offsets()
+        segments = self._segments()
+        for segment in segments:
+            if segment < self.committed[0]:
+                os.remove(self._segment_path(segment))
+        last = max(segments + [self.committed[0]])
+        self._repair_tail(last)
+
+        self.pending_bytes = sum(self._segment_size(segment) for segment in segments if segment >= self.committed[0])
+        self.pending_bytes -= self.committed[1]
+        self.writer = open(self._segment_path(last), 'ab')
+        self.write_pos = (last, self.writer.tell())
+        self.read_pos = self.committed
+        if self.pending_bytes:
+            logging.info(f"Resuming spool {path} with {self.pending_bytes} bytes not yet delivered")
+
+    def _segment_path(self, segment):
+        return os.path.join(self.path, f"{segment_prefix}{segment:06d}{segment_suffix}")
+
+    def _segment_size(self, segment):
+        return os.path.getsize(self._segment_path(segment))
+
+    def _segments(self):
+        return sorted(int(name[len(segment_prefix):-len(segment_suffix)]) for name in os.listdir(self.path)
+                      if name.startswith(segment_prefix) and name.endswith(segment_suffix))
+
+    def _load_offsets(self):
+        offsets_path = os.path.join(self.path, offsets_file)
+        if not os.path.exists(offsets_path):
+            segments = self._segments()
+            return (segments[0] if segments else 1, 0)
+        with open(offsets_path) as f:
+            offsets = json.load(f)
+        return (offsets['segment'], offsets['offset'])
+
+    def _save_offsets(self):
+        # Callers hold self.lock
+        offsets_path = os.path.join(self.path, offsets_file)
+        tmp_path = f"{offsets_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'segment': self.committed[0], 'offset': self.committed[1]}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, offsets_path)
+
+    def _repair_tail(self, segment):
+        # A crash can leave half a record at the end of the last segment
+        segment_path = self._segment_path(segment)
+        if not os.path.exists(segment_path):
+            return
+        with open(segment_path, 'rb+') as f:
+            data = f.read()
+            if data and not data.endswith(b'\n'):
+                f.truncate(data.rfind(b'\n') + 1)
+                logging.warning(f"Dropped a partially written record at the end of {segment_path}")
+
+    def put(self, record):
+        """
+        Append a JSON-serializable record, blocking while the spool is full.
+        """
+        line = json.dumps(record, separators=(',', ':')).encode('utf-8') + b'\n'
+        with self.lock:
+            while self.pending_bytes >= self.max_bytes and self.failure is None:
+                self.not_full.wait()
+            if self.failure is not None:
+                raise SpoolError(f"Spool consumer stopped: {self.failure}")
+
+            self.writer.write(line)
+            self.writer.flush()
+            self.pending_bytes += len(line)
+            self.unsynced += 1
+            offset = self.write_pos[1] + len(line)
+            if offset >= self.segment_bytes:
+                self._sync()
+                self.writer.close()
+                self.writer = open(self._segment_path(self.write_pos[0] + 1), 'ab')
+                self.write_pos = (self.write_pos[0] + 1, 0)
+            else:
+                self.write_pos = (self.write_pos[0], offset)
+                if self.unsynced >= self.fsync_every:
+                    self._sync()
+            self.not_empty.notify()
+
+    def _sync(self):
+        # Callers hold self.lock
+        os.fsync(self.writer.fileno())
+        self.unsynced = 0
+
+    def close(self):
+        """
+        Signal that no more records will be put; consumers drain what is left and stop.
+        """
+        with self.lock:
+            self._sync()
+            self.writer.close()
+            self.closed = True
+            self.not_empty.notify_all()
+
+    def fail(self, reason):
+        """
+        Stop the spool after the sink gave up: blocked and later producers get a SpoolError,
+        consumers stop reading, and undelivered records stay on disk for the next run.
+        """
+        with self.lock:
+            self.failure = reason
+            self.not_full.notify_all()
+            self.not_empty.notify_all()
+
+    def read_batch(self, max_records):
+        """
+        Return the next SpoolBatch of up to `max_records`, waiting for producers when
+        the spool is empty. Returns None once the spool is closed and drained or failed.
+        """
+        with self.read_lock:
+            with self.lock:
+                while self.read_pos == self.write_pos and not self.closed and self.failure is None:
+                    self.not_empty.wait()
+                if self.failure is not None or self.read_pos == self.write_pos:
+                    return None
+                start = self.read_pos
+                write_pos = self.write_pos
+
+            records = []
+            size = 0
+            segment, offset = start
+            while len(records) < max_records and (segment, offset) < write_pos:
+                limit = write_pos[1] if segment == write_pos[0] else None
+                with open(self._segment_path(segment), 'rb') as f:
+                    f.seek(offset)
+                    while len(records) < max_records and (limit is None or offset < limit):
+                        line = f.readline()
+                        if not line:
+                            break
+                        records.append(json.loads(line))
+                        offset += len(line)
+                        size += len(line)
+                if len(records) < max_records and segment < write_pos[0] and (limit is None or offset >= limit):
+                    # End of a finished segment, carry on in the next one
+                    segment, offset = segment + 1, 0
+
+            batch = SpoolBatch(records, start, (segment, offset), size)
+            with self.lock:
+                self.read_pos = batch.end
+                self.outstanding.append(batch)
+            return batch
+
+    def ack(self, batch):
+        """
+        Mark a batch as delivered. The committed offset moves past every batch up to
+        the first one still being delivered, and consumed segments are removed.
+        """
+        with self.lock:
+            batch.acked = True
+            released = 0
+            while self.outstanding and self.outstanding[0].acked:
+                done = self.outstanding.pop(0)
+                self.committed = done.end
+                released += done.size
+            if not released:
+                return
+            self._save_offsets()
+            for segment in self._segments():
+                if segment < self.committed[0]:
+                    os.remove(self._segment_path(segment))
+            self.pending_bytes -= released
+            self.not_full.notify_all()
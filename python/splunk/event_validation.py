@@ -0,0 +1,256 @@
+import logging
+import threading
+import time
+import jsonschema
+
+# Validation stage for the HEC events of the security auditor.
+# Every event goes through a cheap structural check of the HEC envelope; its
+# payload is then checked against the schema of its sourcetype. Each schema is
+# compiled once into plain type/required/properties/items checks, which decide
+# validity on the fast path; the jsonschema validator compiled alongside it only
+# runs for payloads that fail, to explain why. The time spent per schema is
+# tracked so the cost of strict validation stays visible.
+
+timestamp = {"type": "string"}
+nullable_string = {"type": ["string", "null"]}
+total_count = {"type": "object", "properties": {"totalCount": {"type": "integer"}}, "required": ["totalCount"]}
+
+organization_schema = {
+    "type": "object",
+    "properties": {
+        "data": {
+            "type": "object",
+            "properties": {
+                "organization": {
+                    "type": "object",
+                    "properties": {
+                        "name": nullable_string,
+                        "login": {"type": "string"},
+                        "url": {"type": "string"},
+                        "description": nullable_string,
+                        "createdAt": timestamp,
+                        "updatedAt": timestamp,
+                        "repositories": total_count,
+                        "membersWithRole": {
+                            "type": "object",
+                            "properties": {
+                                "totalCount": {"type": "integer"},
+                                "edges": {"type": "array", "items": {
+                                    "type": "object",
+                                    "properties": {
+                                        "role": {"type": "string"},
+                                        "node": {
+                                            "type": "object",
+                                            "properties": {
+                                                "login": {"type": "string"},
+                                                "name": nullable_string,
+                                                "lastActivityAt": nullable_string,
+                                            },
+                                            "required": ["login"],
+                                        },
+                                    },
+                                    "required": ["role", "node"],
+                                }},
+                            },
+                            "required": ["totalCount", "edges"],
+                        },
+                        "teams": {
+                            "type": "object",
+                            "properties": {
+                                "totalCount": {"type": "integer"},
+                                "edges": {"type": "array"},
+                            },
+                            "required": ["totalCount", "edges"],
+                        },
+                    },
+                    "required": ["login", "membersWithRole", "teams"],
+                },
+            },
+            "required": ["organization"],
+        },
+    },
+    "required": ["data"],
+}
+
+repository_schema = {
+    "type": "object",
+    "properties": {
+        "organization": {"type": "string"},
+        "name": {"type": "string"},
+        "createdAt": timestamp,
+        "updatedAt": timestamp,
+        "isFork": {"type": "boolean"},
+        "isPrivate": {"type": "boolean"},
+        "primaryLanguage": {"type": ["object", "null"]},
+        "issues": total_count,
+        "pullRequests": total_count,
+        "releases": total_count,
+        "licenseInfo": {"type": ["object", "null"]},
+        "diskUsage": {"type": ["integer", "null"]},
+        "forkCount": {"type": "integer"},
+        "stargazerCount": {"type": "integer"},
+        "branchProtectionRules": {
+            "type": "object",
+            "properties": {"nodes": {"type": "array", "items": {"type": "object"}}},
+            "required": ["nodes"],
+        },
+    },
+    "required": ["organization", "name", "createdAt", "isFork", "isPrivate"],
+}
+
+payload_schemas = {
+    'github:organization': organization_schema,
+    'github:repository': repository_schema,
+}
+
+# HEC envelope fields and the types they must have when present
+envelope_types = {
+    "time": (int, float),
+    "host": str,
+    "source": str,
+    "sourcetype": str,
+    "index": str,
+}
+
+
+def check_envelope(event):
+    """
+    Structural check of the HEC envelope, returns an error message or None.
+    """
+    if not isinstance(event, dict):
+        return "event is not an object"
+    if not isinstance(event.get("event"), dict):
+        return "'event' is missing or not an object"
+    for field, types in envelope_types.items():
+        value = event.get(field)
+        # bool is an int subclass but not a valid timestamp
+        if value is not None and (not isinstance(value, types) or isinstance(value, bool)):
+            return f"'{field}' has the wrong type"
+    return None
+
+
+json_types = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "integer": int,
+    "number": (int, float),
+    "boolean": bool,
+    "null": type(None),
+}
+fast_keywords = {"type", "properties", "required", "items"}
+
+
+def compile_fast_check(schema):
+    """
+    Compile a schema that only uses type/properties/required/items into a predicate,
+    or return None when it uses other keywords and must go through jsonschema.
+    """
+    if not set(schema) <= fast_keywords:
+        return None
+
+    types = schema.get("type")
+    if types is not None:
+        names = [types] if isinstance(types, str) else types
+        python_types = tuple(json_types[name] for name in names)
+        # bool is an int subclass, so integers and numbers reject it explicitly
+        allow_bool = "boolean" in names
+    required = schema.get("required", ())
+    properties = {}
+    for name, subschema in schema.get("properties", {}).items():
+        check = compile_fast_check(subschema)
+        if check is None:
+            return None
+        properties[name] = check
+    items = None
+    if "items" in schema:
+        items = compile_fast_check(schema["items"])
+        if items is None:
+            return None
+
+    def check(value):
+        if types is not None:
+            if not isinstance(value, python_types) or (isinstance(value, bool) and not allow_bool):
+                return False
+        if isinstance(value, dict):
+            for name in required:
+                if name not in value:
+                    return False
+            for name, property_check in properties.items():
+                if name in value and not property_check(value[name]):
+                    return False
+        elif items is not None and isinstance(value, list):
+            for item in value:
+                if not items(item):
+                    return False
+        return True
+    return check
+
+
+class SchemaStats:
+    def __init__(self):
+        self.events = 0
+        self.invalid = 0
+        self.seconds = 0.0
+
+
+class EventValidator:
+    def __init__(self, schemas=payload_schemas, strict=True):
+        """
+        With `strict` off only the envelope is checked.
+        """
+        self.strict = strict
+        self.validators = {}
+        self.fast_checks = {}
+        for sourcetype, schema in schemas.items():
+            validator_class = jsonschema.validators.validator_for(schema)
+            validator_class.check_schema(schema)
+            self.validators[sourcetype] = validator_class(schema)
+            self.fast_checks[sourcetype] = compile_fast_check(schema) or self.validators[sourcetype].is_valid
+        self.lock = threading.Lock()
+        self.stats = {}
+
+    def validate_batch(self, events):
+        """
+        Split a batch of HEC events into (valid, invalid), logging why each invalid one was rejected.
+        """
+        valid = []
+        invalid = []
+        timings = {}
+        for event in events:
+            started = time.perf_counter()
+            error = check_envelope(event)
+            sourcetype = event.get("sourcetype") if error is None else None
+            validator = self.validators.get(sourcetype) if self.strict else None
+            if validator is not None and not self.fast_checks[sourcetype](event["event"]):
+                # Only failing payloads pay for jsonschema, which has the final say (it accepts
+                # e.g. 1.0 as an integer) and explains the failure
+                best = jsonschema.exceptions.best_match(validator.iter_errors(event["event"]))
+                error = best.message if best is not None else None
+
+            stats = timings.setdefault(sourcetype if validator is not None else 'envelope', [0, 0, 0.0])
+            stats[0] += 1
+            stats[2] += time.perf_counter() - started
+            if error is None:
+                valid.append(event)
+            else:
+                stats[1] += 1
+                invalid.append(event)
+                logging.error(f"Event validation error ({sourcetype or 'unknown sourcetype'}): {error}")
+
+        with self.lock:
+            for name, (count, failed, seconds) in timings.items():
+                stats = self.stats.setdefault(name, SchemaStats())
+                stats.events += count
+                stats.invalid += failed
+                stats.seconds += seconds
+        return valid, invalid
+
+    def report(self):
+        """
+        Log the number of events, rejections and throughput of each schema.
+        """
+        with self.lock:
+            for name, stats in sorted(self.stats.items()):
+                rate = stats.events / stats.seconds if stats.seconds else 0
+                logging.info(f"Validated {stats.events} {name} events ({stats.invalid} invalid) at {rate:.0f} events/s")
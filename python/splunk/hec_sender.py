@@ -0,0 +1,160 @@
+import gzip
+import json
+import logging
+import threading
+import time
+import uuid
+import requests
+
+# Batched Splunk HTTP Event Collector sender.
+# Events are serialized compactly and concatenated into size-capped batches;
+# each batch is gzip-compressed and posted over a pooled keep-alive session.
+# With indexer acknowledgement enabled, at most `max_in_flight` batches wait
+# for their ackId at a time, and a batch that is not acknowledged in time is
+# sent again.
+
+timeout = 30  # Constant for network request timeout
+max_retries = 3
+ack_poll_interval = 2  # Seconds between ack status polls
+ack_timeout = 300  # Seconds before an unacknowledged batch is resent
+
+
+class HecError(Exception):
+    """
+    Raised when a batch could not be delivered to HEC.
+    """
+
+
+class HecSender:
+    def __init__(self, hec_url, token, max_batch_bytes=1000000, use_ack=False, max_in_flight=4, pool_size=4):
+        self.event_url = f"{hec_url}/services/collector/event"
+        self.ack_url = f"{hec_url}/services/collector/ack"
+        self.max_batch_bytes = max_batch_bytes
+        self.use_ack = use_ack
+        self.max_in_flight = max_in_flight
+
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({
+            'Authorization': f'Splunk {token}',
+            'Content-Type': 'application/json',
+            'Content-Encoding': 'gzip',
+        })
+        if use_ack:
+            # Acks are tracked per channel
+            self.session.headers['X-Splunk-Request-Channel'] = str(uuid.uuid4())
+
+        self.lock = threading.Lock()
+        self.buffer = []
+        self.buffer_bytes = 0
+        self.ack_condition = threading.Condition()
+        self.pending_acks = {}  # ackId -> (body, sent_at, event_count)
+        self.events_sent = 0
+        self.batches_sent = 0
+
+    def send(self, event):
+        """
+        Queue one HEC event (a dict with `event`, `sourcetype`, ...), sending the
+        current batch first if the event would push it over the size cap.
+        """
+        line = json.dumps(event, separators=(',', ':')).encode('utf-8')
+        with self.lock:
+            batch = None
+            if self.buffer and self.buffer_bytes + len(line) > self.max_batch_bytes:
+                batch = self._take_batch()
+            self.buffer.append(line)
+            self.buffer_bytes += len(line) + 1
+        if batch:
+            self._post(*batch)
+
+    def _take_batch(self):
+        # Callers hold self.lock
+        body = b'\n'.join(self.buffer)
+        count = len(self.buffer)
+        self.buffer = []
+        self.buffer_bytes = 0
+        return body, count
+
+    def flush(self):
+        """
+        Send whatever is buffered.
+        """
+        with self.lock:
+            batch = self._take_batch() if self.buffer else None
+        if batch:
+            self._post(*batch)
+
+    def _post(self, body, count):
+        if self.use_ack:
+            self._wait_for_window()
+        compressed = gzip.compress(body)
+        for attempt in range(1, max_retries + 1):
+            try:
+                response = self.session.post(self.event_url, data=compressed, timeout=timeout)
+                if response.status_code == 200:
+                    break
+                # 503 means the indexer queue is full and is worth retrying, other codes are not
+                if response.status_code != 503 or attempt == max_retries:
+                    raise HecError(f"HEC rejected a batch of {count} events with status {response.status_code}: {response.text[:500]}")
+            except requests.exceptions.RequestException as e:
+                if attempt == max_retries:
+                    raise HecError(f"Failed to post a batch of {count} events to HEC: {e}") from e
+            time.sleep(2 ** attempt)
+
+        logging.debug(f"Posted a batch of {count} events ({len(body)} bytes, {len(compressed)} compressed) to HEC")
+        with self.ack_condition:
+            self.events_sent += count
+            self.batches_sent += 1
+            if self.use_ack:
+                self.pending_acks[response.json()['ackId']] = (body, time.time(), count)
+
+    def _poll_acks(self):
+        # Callers hold self.ack_condition
+        if not self.pending_acks:
+            return []
+        response = self.session.post(self.ack_url, data=gzip.compress(json.dumps({'acks': list(self.pending_acks)}).encode()),
+                                     timeout=timeout)
+        response.raise_for_status()
+        for ack_id, acknowledged in response.json().get('acks', {}).items():
+            if acknowledged:
+                self.pending_acks.pop(int(ack_id), None)
+        # Batches the indexer never confirmed are handed back for resending
+        now = time.time()
+        expired = [ack_id for ack_id, (_, sent_at, _) in self.pending_acks.items() if now - sent_at > ack_timeout]
+        return [self.pending_acks.pop(ack_id) for ack_id in expired]
+
+    def _wait_for_window(self, limit=None):
+        limit = self.max_in_flight - 1 if limit is None else limit
+        while True:
+            with self.ack_condition:
+                if len(self.pending_acks) <= limit:
+                    return
+                expired = self._poll_acks()
+                waiting = len(self.pending_acks) > limit
+            for body, _, count in expired:
+                logging.warning(f"Batch of {count} events was not acknowledged in time, resending.")
+                self._post(body, count)
+            if waiting:
+                time.sleep(ack_poll_interval)
+
+    def sync(self):
+        """
+        Send the buffered events and, with acknowledgement enabled, wait until every batch is indexed.
+        """
+        self.flush()
+        if self.use_ack:
+            self._wait_for_window(limit=0)
+
+    def discard(self):
+        """
+        Drop buffered events that were not sent, before the caller retries them.
+        """
+        with self.lock:
+            self._take_batch()
+
+    def close(self):
+        self.sync()
+        self.session.close()
+        logging.info(f"Sent {self.events_sent} events in {self.batches_sent} batches to HEC")
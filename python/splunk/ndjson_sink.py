@@ -0,0 +1,95 @@
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+try:
+    import zstandard
+except ImportError:  # zstd output is optional
+    zstandard = None
+
+# Streaming newline-delimited JSON file sink for the auditor's file output.
+# One buffered handle stays open for the whole run and every record is written
+# as one compact JSON line, optionally through gzip or zstd (each run appends a
+# new compressed member/frame, which both formats read back as one stream).
+# With rotation enabled, a new timestamped file is started once the current one
+# has taken `rotate_bytes` of JSON or has been open for `rotate_seconds`.
+
+compression_suffixes = {None: '', 'gzip': '.gz', 'zstd': '.zst'}
+buffer_size = 1024 * 1024
+
+
+class NdjsonFileSink:
+    def __init__(self, path, compression=None, rotate_bytes=None, rotate_seconds=None):
+        if compression not in compression_suffixes:
+            raise ValueError(f"Unsupported compression {compression}, use one of gzip, zstd")
+        if compression == 'zstd' and zstandard is None:
+            raise ValueError("zstd compression needs the zstandard package")
+        self.path = path
+        self.compression = compression
+        self.rotate_bytes = rotate_bytes
+        self.rotate_seconds = rotate_seconds
+        self.lock = threading.Lock()
+        self.sequence = 0
+        self.raw = None
+        self.stream = None
+        self._open()
+
+    def _next_path(self):
+        suffix = compression_suffixes[self.compression]
+        if not (self.rotate_bytes or self.rotate_seconds):
+            return self.path if self.path.endswith(suffix) else self.path + suffix
+        stem, extension = os.path.splitext(self.path)
+        self.sequence += 1
+        return f"{stem}-{datetime.now().strftime('%Y%m%dT%H%M%S')}-{self.sequence:04d}{extension or '.ndjson'}{suffix}"
+
+    def _open(self):
+        # Callers hold self.lock or are still constructing the sink
+        self.current_path = self._next_path()
+        self.raw = open(self.current_path, 'ab', buffering=buffer_size)
+        if self.compression == 'gzip':
+            self.stream = gzip.GzipFile(fileobj=self.raw, mode='ab')
+        elif self.compression == 'zstd':
+            self.stream = zstandard.ZstdCompressor().stream_writer(self.raw, closefd=False)
+        else:
+            self.stream = self.raw
+        self.opened_at = time.monotonic()
+        self.written = 0
+
+    def _close_file(self):
+        # Callers hold self.lock
+        if self.stream is not self.raw:
+            self.stream.close()
+        self.raw.close()
+
+    def write(self, records):
+        """
+        Append records as one JSON line each, rotating first when the current file is due.
+        """
+        data = b''.join(json.dumps(record, separators=(',', ':')).encode('utf-8') + b'\n' for record in records)
+        with self.lock:
+            if self.written and ((self.rotate_bytes and self.written + len(data) > self.rotate_bytes) or
+                                 (self.rotate_seconds and time.monotonic() - self.opened_at >= self.rotate_seconds)):
+                self._close_file()
+                logging.info(f"Rotated {self.current_path} after {self.written} bytes")
+                self._open()
+            self.stream.write(data)
+            self.written += len(data)
+
+    def flush(self):
+        """
+        Push buffered and compressed data to the OS, so everything written so far is readable.
+        """
+        with self.lock:
+            if self.compression == 'zstd':
+                self.stream.flush(zstandard.FLUSH_BLOCK)
+            else:
+                self.stream.flush()
+            self.raw.flush()
+
+    def close(self):
+        with self.lock:
+            self._close_file()
@@ -0,0 +1,90 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from dotenv import load_dotenv
+
+# Local SQLite cache of Splunk saved searches shared by the Splunk scripts.
+# A sync starts from a light listing (names, ACL and `updated` only); entries
+# whose `updated` timestamp differs from the cached one are fetched in full by
+# the caller and stored with a hash of their content, and entries that are no
+# longer listed are dropped. Reports are then written from the cache, so a run
+# only downloads the saved searches that changed since the previous one.
+
+load_dotenv()  # take environment variables from .env
+cache_path = os.getenv('SPLUNK_SAVED_SEARCH_CACHE', 'saved_searches.sqlite')
+
+schema = '''
+CREATE TABLE IF NOT EXISTS saved_searches (
+    namespace TEXT NOT NULL,
+    app TEXT NOT NULL,
+    owner TEXT NOT NULL,
+    name TEXT NOT NULL,
+    updated TEXT,
+    content_hash TEXT NOT NULL,
+    content TEXT NOT NULL,
+    PRIMARY KEY (namespace, app, owner, name)
+);
+CREATE TABLE IF NOT EXISTS syncs (
+    namespace TEXT PRIMARY KEY,
+    last_sync REAL NOT NULL
+);
+'''
+
+
+def content_hash(content):
+    return hashlib.sha256(json.dumps(content, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def entry_key(entry):
+    return (entry['app'], entry['owner'], entry['name'])
+
+
+class SavedSearchCache:
+    def __init__(self, path=cache_path):
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(schema)
+
+    def close(self):
+        self.conn.close()
+
+    def synced_before(self, namespace):
+        row = self.conn.execute('SELECT last_sync FROM syncs WHERE namespace = ?', (namespace,)).fetchone()
+        return row is not None
+
+    def sync(self, namespace, stubs, fetch_full, full=False):
+        """
+        Bring the cache for `namespace` (e.g. the endpoint a listing came from) up to date.
+        `stubs` are dicts with name, app, owner and updated for every saved search listed;
+        `fetch_full(changed_stubs)` returns the same dicts with a `content` dict added for
+        the entries that are new or changed. Returns (changed, deleted) counts.
+        """
+        known = {(app, owner, name): updated for app, owner, name, updated in self.conn.execute(
+            'SELECT app, owner, name, updated FROM saved_searches WHERE namespace = ?', (namespace,))}
+        changed = [stub for stub in stubs if full or known.get(entry_key(stub)) != stub['updated']]
+        listed = {entry_key(stub) for stub in stubs}
+        deleted = [key for key in known if key not in listed]
+
+        entries = fetch_full(changed) if changed else []
+        with self.conn:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO saved_searches (namespace, app, owner, name, updated, content_hash, content) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [(namespace, entry['app'], entry['owner'], entry['name'], entry['updated'],
+                  content_hash(entry['content']), json.dumps(entry['content'])) for entry in entries])
+            self.conn.executemany('DELETE FROM saved_searches WHERE namespace = ? AND app = ? AND owner = ? AND name = ?',
+                                  [(namespace, *key) for key in deleted])
+            self.conn.execute('INSERT OR REPLACE INTO syncs (namespace, last_sync) VALUES (?, ?)', (namespace, time.time()))
+        logging.info(f"Synced saved searches of {namespace}: {len(stubs)} listed, {len(entries)} updated, {len(deleted)} removed.")
+        return len(entries), len(deleted)
+
+    def entries(self, namespace):
+        """
+        Return the cached saved searches of a namespace as dicts with name, app, owner, updated and content.
+        """
+        rows = self.conn.execute('SELECT app, owner, name, updated, content FROM saved_searches WHERE namespace = ? '
+                                 'ORDER BY name, app, owner', (namespace,))
+        return [{'app': app, 'owner': owner, 'name': name, 'updated': updated, 'content': json.loads(content)}
+                for app, owner, name, updated, content in rows]
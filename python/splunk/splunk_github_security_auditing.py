@@ -1,14 +1,25 @@
 # Import necessary modules
 import os
+import sys
 import requests
-import json
-import jsonschema
 import logging
-import queue
+import signal
+import threading
 import time
 from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
+# The GitHub rate-limit governor and GraphQL helpers are shared with the scripts in ../github
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'github'))
+from github_rate_limit import governed_request  # noqa: E402
+from github_graphql import GraphQLError  # noqa: E402
+from graphql_pagination import paginate, PageSizer, PointBudget  # noqa: E402
+from hec_sender import HecSender, HecError  # noqa: E402
+from event_validation import EventValidator  # noqa: E402
+from audit_logging import setup_logging  # noqa: E402
+from event_spool import EventSpool, SpoolError  # noqa: E402
+from ndjson_sink import NdjsonFileSink  # noqa: E402
+
 # Load environment variables
 load_dotenv()
 
@@ -21,240 +32,291 @@ splunk_index = os.getenv('SPLUNK_INDEX')
 hec = os.getenv('HEC') == 'True'  # 'True' or 'False' in .env
 scope = os.getenv('SCOPE')  # 'org', 'repo', or 'both' in .env
 output_file = os.getenv('OUTPUT_FILE')
+output_compression = os.getenv('OUTPUT_COMPRESSION') or None  # 'gzip' or 'zstd' for a compressed OUTPUT_FILE
+output_rotate_bytes = int(os.getenv('OUTPUT_ROTATE_BYTES', '0'))  # Start a new output file after this many bytes of JSON
+output_rotate_seconds = int(os.getenv('OUTPUT_ROTATE_SECONDS', '0'))  # Start a new output file after this many seconds
+hec_batch_bytes = int(os.getenv('HEC_BATCH_BYTES', '1000000'))  # Uncompressed size cap of one HEC batch
+hec_use_ack = os.getenv('HEC_USE_ACK') == 'True'  # Wait for indexer acknowledgement of every batch
+hec_max_in_flight = int(os.getenv('HEC_MAX_IN_FLIGHT', '4'))  # Batches awaiting acknowledgement at once
+strict_validation = os.getenv('VALIDATION_MODE', 'strict') == 'strict'  # 'strict' checks payloads, 'envelope' only the HEC fields
+validation_batch_size = 500  # Queued events validated and sent together
+log_level = os.getenv('LOG_LEVEL', 'INFO')
+log_sample_every = int(os.getenv('LOG_SAMPLE_EVERY', '100'))  # Keep one in N request/response records
+spool_dir = os.getenv('SPOOL_DIR', '.audit_spool')  # Undelivered events survive here between runs
+spool_max_bytes = int(os.getenv('SPOOL_MAX_BYTES', str(256 * 1024 * 1024)))  # Fetchers block above this backlog
+spool_drain_only = os.getenv('SPOOL_DRAIN_ONLY') == 'True'  # Only deliver what a previous run left in the spool
+sink_max_attempts = 10  # Attempts to deliver one spooled batch before giving up
+sink_workers = int(os.getenv('SINK_WORKERS', '4'))  # Threads delivering spooled batches to HEC or the output file
+fetch_workers = 5  # Organizations fetched concurrently
+nested_workers = 8  # Member and team pages fetched concurrently across orgs
 
 headers = {
     'Authorization': f'Bearer {api_key}',
     'Accept': 'application/vnd.github+json'
 }
 
-headers_splunk = {
-    'Authorization': f'Splunk {splunk_hec_token}',
-    'Content-Type': 'application/json'
-}
-
-# Initialize a queue to store results
-org_queue = queue.Queue()
-repo_queue = queue.Queue()
-
-# Set up logging configuration
-logging.basicConfig(level=logging.INFO,
-                    format='%(asctime)s - %(levelname)s - %(message)s',
-                    handlers=[
-                        logging.FileHandler("log.txt"),
-                        logging.StreamHandler()
-                    ])
-
-
-def perform_request(url, headers, query):
-    response = requests.post(url, headers=headers, json={'query': query})
-
-    # Log the entire request object and headers
-    logging.info(f"Request Method: {response.request.method}")
-    logging.info(f"Request URL: {response.request.url}")
-    logging.info(f"Request Headers: {response.request.headers}")
-    logging.info(f"Request Body: {response.request.body}")
-
-    # Log response status
-    logging.info(f"Response Status Code: {response.status_code}")
-
-    return response
-
-
-def update_rate_limit(response):
-    limit = response.headers.get('X-RateLimit-Limit')
-    remaining = response.headers.get('X-RateLimit-Remaining')
-    reset_time = response.headers.get('X-RateLimit-Reset')
-
-    logging.info(f"Rate Limit: {limit}")
-    logging.info(f"Rate Limit Remaining: {remaining}")
-    logging.info(f"Rate Limit Reset Time: {reset_time}")
-
-    if remaining == 0:
-        sleep_time = int(reset_time) - time.time()
-        logging.info(
-            f"Rate limit exceeded. Sleeping for {sleep_time} seconds.")
-        time.sleep(sleep_time)
-
-
-def get_org_and_repo_info(org_name):
-    # Function to get organization and repository information
-    logging.info(f"Getting org and repo info for {org_name}")
-
-    # Compressed get_org_info logic
-    try:
-        org_query = f'''
-        query {{
-            organization(login: "{org_name}") {{
-                name
-                login
-                url
-                description
-                createdAt
-                updatedAt
-                repositories {{ totalCount }}
-                membersWithRole(first: 20) {{
-                    totalCount
-                    edges {{
-                        role
-                        node {{
-                            login
-                            name
-                            pullRequests(last: 1) {{
-                                totalCount
-                                nodes {{ createdAt }}
-                            }}
-                            issues(last: 1) {{
-                                totalCount
-                                nodes {{ createdAt }}
-                            }}
-                        }}
+graphql_url = 'https://api.github.com/graphql'
+rate_limit_fields = 'rateLimit { cost remaining resetAt limit }'
+
+org_query = f'''
+query($org: String!) {{
+    organization(login: $org) {{
+        name
+        login
+        url
+        description
+        createdAt
+        updatedAt
+        repositories {{ totalCount }}
+        membersWithRole {{ totalCount }}
+        teams {{ totalCount }}
+    }}
+    {rate_limit_fields}
+}}
+'''
+
+members_query = f'''
+query($org: String!, $first: Int!, $after: String) {{
+    organization(login: $org) {{
+        membersWithRole(first: $first, after: $after) {{
+            pageInfo {{ hasNextPage endCursor }}
+            edges {{
+                role
+                node {{
+                    login
+                    name
+                    pullRequests(last: 1) {{
+                        totalCount
+                        nodes {{ createdAt }}
+                    }}
+                    issues(last: 1) {{
+                        totalCount
+                        nodes {{ createdAt }}
                     }}
                 }}
-                teams(first: 20) {{
-                    totalCount
-                    edges {{
-                        node {{
-                            name
-                            members {{
-                                totalCount
-                                edges {{
-                                    role
-                                    node {{ login name }}
-                                }}
-                            }}
+            }}
+        }}
+    }}
+    {rate_limit_fields}
+}}
+'''
+
+# Each team comes with its first 100 members; larger teams are paged with team_members_query
+teams_query = f'''
+query($org: String!, $first: Int!, $after: String) {{
+    organization(login: $org) {{
+        teams(first: $first, after: $after) {{
+            pageInfo {{ hasNextPage endCursor }}
+            edges {{
+                node {{
+                    name
+                    slug
+                    members(first: 100) {{
+                        totalCount
+                        pageInfo {{ hasNextPage endCursor }}
+                        edges {{
+                            role
+                            node {{ login name }}
                         }}
                     }}
                 }}
             }}
         }}
-        '''
-
-        logging.info(f"Sending request for {org_name}")
-        response = perform_request(
-            'https://api.github.com/graphql', headers, org_query)
-        logging.info(f"Received response for {org_name}")
-
-        update_rate_limit(response)
-        if response.status_code == 200:
-            org_info = response.json()
+    }}
+    {rate_limit_fields}
+}}
+'''
+
+team_members_query = f'''
+query($org: String!, $slug: String!, $first: Int!, $after: String) {{
+    organization(login: $org) {{
+        team(slug: $slug) {{
+            members(first: $first, after: $after) {{
+                pageInfo {{ hasNextPage endCursor }}
+                edges {{
+                    role
+                    node {{ login name }}
+                }}
+            }}
+        }}
+    }}
+    {rate_limit_fields}
+}}
+'''
+
+repos_query = f'''
+query($org: String!, $first: Int!, $after: String) {{
+    organization(login: $org) {{
+        repositories(first: $first, after: $after) {{
+            pageInfo {{ hasNextPage endCursor }}
+            nodes {{
+                name
+                createdAt
+                updatedAt
+                isFork
+                isPrivate
+                primaryLanguage {{ name }}
+                issues {{ totalCount }}
+                pullRequests {{ totalCount }}
+                releases {{ totalCount }}
+                licenseInfo {{ name }}
+                diskUsage
+                commitComments {{ totalCount }}
+                vulnerabilityAlerts {{ totalCount }}
+                forkCount
+                stargazerCount
+                watchers {{ totalCount }}
+                branchProtectionRules(first: 20) {{
+                    nodes {{
+                        pattern
+                        requiresApprovingReviews
+                        requiredApprovingReviewCount
+                        isAdminEnforced
+                    }}
+                }}
+            }}
+        }}
+    }}
+    {rate_limit_fields}
+}}
+'''
+
+# Pooled connections for GraphQL, a point budget shared by every paginator of the run
+# and a pool for the nested member/team connections of the orgs being fetched
+session = requests.Session()
+budget = PointBudget()
+nested_executor = ThreadPoolExecutor(max_workers=nested_workers)
+
+# Set up logging configuration: a background thread writes log.txt and stderr,
+# request details are sampled, truncated and have credentials redacted
+setup_logging("log.txt", level=log_level, sample_every=log_sample_every)
+http_log = logging.getLogger('auditor.http')
+
+
+def perform_request(url, headers, query, variables=None):
+    # The governor picks a token from the pool, paces requests and retries rate-limited ones
+    started = time.monotonic()
+    response = governed_request(
+        lambda request_headers: session.post(url, headers=request_headers,
+                                             json={'query': query, 'variables': variables or {}}, timeout=60),
+        headers, resource='graphql')
+
+    # Arguments are only formatted (and truncated) by the log writer for sampled records
+    http_log.info("graphql request method=%s url=%s status=%s elapsed=%.3fs response_bytes=%s variables=%s query=%s",
+                  response.request.method, url, response.status_code, time.monotonic() - started,
+                  len(response.content), variables, query)
 
-            # Log success status
-            logging.info(
-                f"Successfully fetched org info for {org_name} with status code: {response.status_code}")
+    return response
 
-            if 'errors' in org_info:
-                for error in org_info['errors']:
-                    logging.error(
-                        f"Error fetching org info for {org_name}: {error['message']}")
-                return
 
-            for member_edge in org_info['data']['organization']['membersWithRole']['edges']:
-                member = member_edge['node']
-                member['lastActivityAt'] = None
+def run_graphql(query, headers, variables):
+    # Same contract as github_graphql.graphql, through the logged perform_request
+    response = perform_request(graphql_url, headers, query, variables)
+    response.raise_for_status()
+    body = response.json()
+    errors = body.get('errors') or []
+    if body.get('data') is None:
+        raise GraphQLError("; ".join(error.get('message', str(error)) for error in errors))
+    return body['data'], errors
+
+
+def page_all(query, variables, path, sizer):
+    # Collect every page of a nested connection, errors are raised to the org level
+    items = []
+    for connection, errors in paginate(query, variables, path, headers, budget, sizer, execute=run_graphql):
+        if errors:
+            raise GraphQLError("; ".join(error['message'] for error in errors))
+        items.extend(connection['edges'])
+    return items
+
+
+def fetch_team_members(org_name, team):
+    # Teams larger than the members page embedded in the teams query are paged on their own
+    members = team['members']
+    edges = members['edges']
+    if members['pageInfo']['hasNextPage']:
+        edges = page_all(team_members_query, {'org': org_name, 'slug': team['slug']},
+                         ('organization', 'team', 'members'), PageSizer(initial=100))
+    team['members'] = {'totalCount': members['totalCount'], 'edges': edges}
+
+
+def get_org_info(org_name):
+    # Organization fields, then all members and teams paged concurrently
+    data, _ = run_graphql(org_query, headers, {'org': org_name})
+    budget.update(data['rateLimit'])
+    organization = data['organization']
+
+    members_future = nested_executor.submit(page_all, members_query, {'org': org_name},
+                                            ('organization', 'membersWithRole'), PageSizer(initial=100))
+    teams = page_all(teams_query, {'org': org_name}, ('organization', 'teams'), PageSizer(initial=20))
+    for future in [nested_executor.submit(fetch_team_members, org_name, edge['node']) for edge in teams]:
+        future.result()
+    members = members_future.result()
+
+    for member_edge in members:
+        member = member_edge['node']
+        member['lastActivityAt'] = None
+
+        if member['pullRequests']['totalCount'] > 0:
+            pr_time = member['pullRequests']['nodes'][0]['createdAt']
+            member['lastActivityAt'] = pr_time
+
+        if member['issues']['totalCount'] > 0:
+            issue_time = member['issues']['nodes'][0]['createdAt']
+            if member['lastActivityAt'] is None or issue_time > member['lastActivityAt']:
+                member['lastActivityAt'] = issue_time
+
+    organization['membersWithRole']['edges'] = members
+    organization['teams']['edges'] = teams
+    return {'data': {'organization': organization}}
 
-                if member['pullRequests']['totalCount'] > 0:
-                    pr_time = member['pullRequests']['nodes'][0]['createdAt']
-                    member['lastActivityAt'] = pr_time
 
-                if member['issues']['totalCount'] > 0:
-                    issue_time = member['issues']['nodes'][0]['createdAt']
-                    if member['lastActivityAt'] is None or issue_time > member['lastActivityAt']:
-                        member['lastActivityAt'] = issue_time
+def get_org_and_repo_info(org_name):
+    # Function to get organization and repository information
+    if shutdown.is_set():
+        return
+    logging.info(f"Getting org and repo info for {org_name}")
 
-            org_queue.put(org_info)
-            logging.info(
-                f"Successfully fetched and queued org info for {org_name}")
-        else:
-            logging.error(
-                f"Error fetching org info for {org_name}: {response.content}")
+    try:
+        org_info = get_org_info(org_name)
+        members = org_info['data']['organization']['membersWithRole']['edges']
+        logging.info(f"Fetched org info for {org_name} with {len(members)} members")
+        if scope in ['org', 'both']:
+            spool.put({'scope': 'organization', 'data': org_info})
+        logging.info(
+            f"Successfully fetched and spooled org info for {org_name}")
+    except SpoolError:
+        raise
     except Exception as e:
         logging.error(
             f"Exception occurred while fetching org info for {org_name}: {str(e)}")
 
-    # Compressed get_repo_info logic
+    # Repositories are paged with a size adapted to their cost and latency
     logging.info(f"Getting repo info for {org_name}")
-    cursor = None
-    all_repos = []
-
-    while True:
-        repo_query = f'''
-        query {{
-            organization(login: "{org_name}") {{
-                repositories(first: 50{', after: "' + cursor + '"' if cursor else ''}) {{
-                    pageInfo {{ hasNextPage endCursor }}
-                    nodes {{
-                        name
-                        createdAt
-                        updatedAt
-                        isFork
-                        isPrivate
-                        primaryLanguage {{ name }}
-                        issues {{ totalCount }}
-                        pullRequests {{ totalCount }}
-                        releases {{ totalCount }}
-                        licenseInfo {{ name }}
-                        diskUsage
-                        commitComments {{ totalCount }}
-                        vulnerabilityAlerts {{ totalCount }}
-                        forkCount
-                        stargazerCount
-                        watchers {{ totalCount }}
-                        branchProtectionRules(first: 20) {{
-                            nodes {{
-                                pattern
-                                requiresApprovingReviews
-                                requiredApprovingReviewCount
-                                isAdminEnforced
-                            }}
-                        }}
-                    }}
-                }}
-            }}
-        }}
-        '''
-
-        response = perform_request(
-            'https://api.github.com/graphql', headers, repo_query)
-        update_rate_limit(response)
-
-        if response.status_code == 200:
-            repo_info = response.json()
-
-            if 'errors' in repo_info:
-                for error in repo_info['errors']:
+    repo_count = 0
+    try:
+        for repositories, errors in paginate(repos_query, {'org': org_name}, ('organization', 'repositories'),
+                                             headers, budget, PageSizer(initial=50), execute=run_graphql):
+            if errors:
+                for error in errors:
                     logging.error(
                         f"Error fetching repo info for {org_name}: {error['message']}")
                 return
 
-            for repo in repo_info['data']['organization']['repositories']['nodes']:
+            # One event per repository, spooled as soon as its page is parsed
+            for repo in repositories['nodes']:
                 repo['organization'] = org_name
+                if scope in ['repo', 'both']:
+                    spool.put({'scope': 'repository', 'data': repo})
+                repo_count += 1
 
-            all_repos.extend(
-                repo_info['data']['organization']['repositories']['nodes'])
-
-            has_next_page = repo_info['data']['organization']['repositories']['pageInfo']['hasNextPage']
-            if has_next_page:
-                cursor = repo_info['data']['organization']['repositories']['pageInfo']['endCursor']
-                time.sleep(0.5)
-            else:
+            if shutdown.is_set():
                 break
-        else:
-            logging.error(
-                f"Error fetching repo info for {org_name}: {response.content}")
-            break
-
-    all_repos_dict = {
-        'data': {
-            'organization': {
-                'repositories': {
-                    'nodes': all_repos
-                }
-            }
-        }
-    }
+    except (requests.exceptions.RequestException, GraphQLError) as e:
+        logging.error(
+            f"Error fetching repo info for {org_name}: {e}")
 
-    repo_queue.put(all_repos_dict)
-    logging.info(f"Successfully fetched and queued repo info for {org_name}")
+    logging.info(f"Successfully fetched and spooled {repo_count} repositories for {org_name}")
 
 
 def transform_to_splunk_format(data, scope_type):
@@ -268,79 +330,112 @@ def transform_to_splunk_format(data, scope_type):
     }
 
 
-def validate_event(event):
-    schema = {
-        "type": "object",
-        "properties": {
-            "time": {"type": "number"},
-            "host": {"type": "string"},
-            "source": {"type": "string"},
-            "sourcetype": {"type": "string"},
-            "index": {"type": "string"},
-            "event": {"type": "object"},
-        },
-        "required": ["event"],
-    }
-
-    try:
-        jsonschema.validate(instance=event, schema=schema)
-        return True
-    except jsonschema.exceptions.ValidationError as e:
-        logging.error(f"Event validation error: {str(e)}")
-        return False
-
-
-def save_to_splunk(data, splunk_url, token, index, scope_type):
-    # Transform and validate the data payload for Splunk
-    event_data = transform_to_splunk_format(data, scope_type)
-    if not validate_event(event_data):
-        logging.error(f"Invalid event data: {event_data}")
-        return
-
-    # Log the entire PUT request
-    put_request = {
-        "url": f"{splunk_url}/services/collector/event",
-        "headers": headers_splunk,
-        "data": json.dumps(event_data)
-    }
-    logging.info(f"Sending the following PUT request to Splunk: {put_request}")
-
-    # Send the data to Splunk using the requests library
-    response = requests.post(
-        put_request["url"], headers=put_request["headers"], data=put_request["data"])
-    if response.status_code == 200:
-        logging.info(
-            f"Successfully posted {scope_type} data to Splunk with status code: {response.status_code}")
+def to_splunk_events(records):
+    # Transform and validate the data payloads of a spooled batch, one validation batch per sourcetype
+    events = []
+    for scope_type in ('organization', 'repository'):
+        items = [record['data'] for record in records if record['scope'] == scope_type]
+        if not items:
+            continue
+        valid, invalid = validator.validate_batch([transform_to_splunk_format(data, scope_type) for data in items])
+        if invalid:
+            logging.error(f"{len(invalid)} invalid {scope_type} events were not delivered")
+        events.extend(valid)
+    return events
+
+
+def write_batch(sender, records):
+    # Deliver one spooled batch; only returns once the sink has accepted all of it
+    events = to_splunk_events(records)
+    if sender:
+        # Events are batched, compressed and posted by the sender; HecError is left to the caller to retry
+        for event_data in events:
+            sender.send(event_data)
+        sender.sync()
     else:
-        logging.error(
-            f"Failed to post {scope_type} data to Splunk. Response status code: {response.status_code}")
-        logging.error(f"Response content: {response.content}")
-
-
-# Define the executor
-with ThreadPoolExecutor(max_workers=5) as executor:
-    org_futures = {executor.submit(get_org_and_repo_info, org_name)
-                   for org_name in org_names}
-
-while not org_queue.empty() or not repo_queue.empty():
-    if not org_queue.empty() and scope in ['org', 'both']:
-        org_info = org_queue.get()
-        if hec:
-            save_to_splunk(org_info, splunk_hec_url,
-                           splunk_hec_token, splunk_index, 'organization')
-        else:
-            with open(output_file, 'a') as f:
-                json.dump(org_info, f, indent=4)
-                f.write('\n')
-                logging.info("Successfully wrote org data to file")
-
-    if not repo_queue.empty() and scope in ['repo', 'both']:
-        repo_info = repo_queue.get()
-        if hec:
-            save_to_splunk(repo_info, splunk_hec_url,
-                           splunk_hec_token, splunk_index, 'repository')
+        # The same HEC events as NDJSON, so the file can be uploaded to Splunk later
+        file_sink.write(events)
+        file_sink.flush()
+        logging.info(f"Successfully wrote {len(events)} events to {file_sink.current_path}")
+
+
+def drain_spool():
+    # One sink worker: consume spooled batches until the spool is closed and drained,
+    # retrying a failed batch before its offset is committed. Each worker has its own
+    # sender, so a sync only waits for the worker's own events
+    sender = HecSender(splunk_hec_url, splunk_hec_token, max_batch_bytes=hec_batch_bytes,
+                       use_ack=hec_use_ack, max_in_flight=hec_max_in_flight) if hec else None
+    try:
+        deliver_batches(sender)
+    finally:
+        if sender:
+            sender.session.close()
+
+
+def deliver_batches(sender):
+    while not shutdown.is_set():
+        batch = spool.read_batch(validation_batch_size)
+        if batch is None:
+            return
+        for attempt in range(1, sink_max_attempts + 1):
+            try:
+                write_batch(sender, batch.records)
+                break
+            except (HecError, OSError) as e:
+                if sender:
+                    sender.discard()
+                logging.error(f"Failed to deliver {len(batch.records)} spooled records (attempt {attempt}). Error: {e}")
+                time.sleep(min(60, 2 ** attempt))
         else:
-            with open(output_file, 'a') as f:
-                json.dump(repo_info, f, indent=4)
-                f.write('\n')
-                logging.info("Successfully wrote repo data to file")
+            spool.fail("the sink kept failing")
+            logging.error(f"Giving up on the sink; undelivered records stay in {spool_dir} for the next run")
+            return
+        spool.ack(batch)
+
+
+def request_shutdown(signum, frame):
+    # Fetchers stop at their next page and sink workers after their current batch;
+    # whatever is still spooled is delivered by the next run
+    logging.warning(f"Received signal {signum}, shutting down")
+    shutdown.set()
+    # Wake blocked producers and idle consumers from another thread, the spool lock may be held here
+    threading.Thread(target=spool.fail, args=("shutdown requested",)).start()
+
+
+# Validators are compiled once per sourcetype and shared by every batch
+validator = EventValidator(strict=strict_validation)
+file_sink = None if hec else NdjsonFileSink(output_file, compression=output_compression,
+                                            rotate_bytes=output_rotate_bytes or None,
+                                            rotate_seconds=output_rotate_seconds or None)
+shutdown = threading.Event()
+
+# Fetchers write to a bounded on-disk spool that the sink workers drain while they run;
+# records left over from an interrupted run are delivered first
+spool = EventSpool(spool_dir, max_bytes=spool_max_bytes)
+signal.signal(signal.SIGINT, request_shutdown)
+signal.signal(signal.SIGTERM, request_shutdown)
+
+sinks = [threading.Thread(target=drain_spool, name=f"sink-{i}") for i in range(sink_workers)]
+for sink in sinks:
+    sink.start()
+
+if not spool_drain_only:
+    with ThreadPoolExecutor(max_workers=fetch_workers) as executor:
+        org_futures = [executor.submit(get_org_and_repo_info, org_name)
+                       for org_name in org_names]
+    for future in org_futures:
+        if isinstance(future.exception(), SpoolError):
+            logging.error(f"Stopped fetching early: {future.exception()}")
+        elif future.exception() is not None:
+            logging.error(f"Exception occurred while fetching org info: {future.exception()}")
+
+nested_executor.shutdown()
+
+# No more producers: the sink workers drain the rest of the spool and exit
+spool.close()
+for sink in sinks:
+    sink.join()
+
+validator.report()
+if file_sink:
+    file_sink.close()
@@ -0,0 +1,175 @@
+import csv
+import json
+import logging
+import math
+import threading
+import time
+import requests
+import urllib3
+from concurrent.futures import ThreadPoolExecutor
+
+# Endpoint x credential probe matrix for the Splunk management API.
+# Every credential gets its own pooled keep-alive session, and all
+# (endpoint, credential, sample) requests run on one bounded thread pool. Each
+# cell of the matrix records the status codes, latency percentiles and payload
+# size of its samples.
+
+default_endpoints = [
+    "services/server/info",
+    "services/server/settings",
+    "services/authentication/current-context",
+    "services/authentication/users",
+    "services/authorization/roles",
+    "services/authorization/capabilities",
+    "services/apps/local",
+    "services/data/indexes",
+    "services/data/inputs/all",
+    "services/data/inputs/http",
+    "services/data/inputs/monitor",
+    "services/data/lookup-table-files",
+    "services/data/models",
+    "services/data/ui/views",
+    "services/saved/searches",
+    "services/saved/eventtypes",
+    "services/search/jobs",
+    "services/alerts/fired_alerts",
+    "services/configs/conf-props",
+    "services/configs/conf-transforms",
+    "services/configs/conf-inputs",
+    "services/configs/conf-outputs",
+    "services/deployment/server/clients",
+    "services/cluster/master/info",
+    "services/licenser/pools",
+    "services/licenser/licenses",
+    "services/kvstore/status",
+    "services/messages",
+    "services/properties",
+    "services/storage/passwords",
+]
+
+
+class Credential:
+    def __init__(self, name, token=None, username=None, password=None):
+        self.name = name
+        self.token = token
+        self.username = username
+        self.password = password
+
+    def session(self, pool_size, verify):
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.verify = verify
+        if self.token:
+            # Like splunklib, send session keys as "Splunk <key>"; a value that already names its scheme goes as is
+            if self.token.startswith(('Splunk ', 'Bearer ')):
+                session.headers['Authorization'] = self.token
+            else:
+                session.headers['Authorization'] = f"Splunk {self.token}"
+        else:
+            session.auth = (self.username, self.password)
+        return session
+
+
+def load_credentials(path):
+    """
+    Read a JSON list of {"name", "token"} or {"name", "username", "password"} objects.
+    """
+    with open(path) as f:
+        return [Credential(entry['name'], entry.get('token'), entry.get('username'), entry.get('password'))
+                for entry in json.load(f)]
+
+
+def load_endpoints(path):
+    with open(path) as f:
+        return [line.strip().lstrip('/') for line in f if line.strip() and not line.startswith('#')]
+
+
+def percentile(values, fraction):
+    # Nearest-rank percentile of a sorted list
+    return values[max(0, math.ceil(fraction * len(values)) - 1)]
+
+
+class Cell:
+    def __init__(self):
+        self.statuses = {}
+        self.latencies = []
+        self.payload_bytes = 0
+        self.errors = []
+
+    def summary(self):
+        latencies = sorted(self.latencies)
+        return {
+            'status': ' '.join(f"{status}x{count}" if count > 1 else str(status) for status, count in sorted(self.statuses.items())),
+            'ok': bool(self.statuses) and all(200 <= status < 300 for status in self.statuses),
+            'p50_ms': round(percentile(latencies, 0.5) * 1000, 1) if latencies else None,
+            'p90_ms': round(percentile(latencies, 0.9) * 1000, 1) if latencies else None,
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 1) if latencies else None,
+            'bytes': self.payload_bytes // max(1, sum(self.statuses.values())),
+            'error': self.errors[-1] if self.errors else '',
+        }
+
+
+def run_probe_matrix(base_url, endpoints, credentials, samples=5, workers=16, timeout=30, verify=False):
+    """
+    Request every endpoint `samples` times with every credential and return
+    {(endpoint, credential name): summary dict}.
+    """
+    if not verify:
+        # Management ports commonly use self-signed certificates, as splunklib assumes
+        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+    sessions = {credential.name: credential.session(workers, verify) for credential in credentials}
+    cells = {(endpoint, credential.name): Cell() for endpoint in endpoints for credential in credentials}
+    lock = threading.Lock()
+
+    def probe(endpoint, credential_name):
+        cell = cells[(endpoint, credential_name)]
+        started = time.monotonic()
+        try:
+            response = sessions[credential_name].get(f"{base_url}/{endpoint}", params={'output_mode': 'json', 'count': 1},
+                                                     timeout=timeout)
+            elapsed = time.monotonic() - started
+            with lock:
+                cell.latencies.append(elapsed)
+                cell.statuses[response.status_code] = cell.statuses.get(response.status_code, 0) + 1
+                cell.payload_bytes += len(response.content)
+        except requests.exceptions.RequestException as e:
+            with lock:
+                cell.errors.append(type(e).__name__)
+
+    tasks = [(endpoint, credential.name) for _ in range(samples) for endpoint in endpoints for credential in credentials]
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for future in [executor.submit(probe, *task) for task in tasks]:
+            future.result()
+    logging.info(f"Probed {len(endpoints)} endpoints x {len(credentials)} credentials ({len(tasks)} requests) "
+                 f"in {time.monotonic() - started:.1f}s")
+    for session in sessions.values():
+        session.close()
+    return {key: cell.summary() for key, cell in cells.items()}
+
+
+def write_matrix_report(results, endpoints, credentials, csv_path):
+    """
+    Write one CSV row per cell and print an endpoint x credential matrix of status and median latency.
+    """
+    with open(csv_path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Endpoint', 'Credential', 'Status', 'OK', 'p50 ms', 'p90 ms', 'p99 ms', 'Bytes', 'Error'])
+        for (endpoint, credential_name), summary in results.items():
+            writer.writerow([endpoint, credential_name, summary['status'], summary['ok'], summary['p50_ms'],
+                             summary['p90_ms'], summary['p99_ms'], summary['bytes'], summary['error']])
+
+    names = [credential.name for credential in credentials]
+    width = max(len(endpoint) for endpoint in endpoints)
+    column = max([len(name) for name in names] + [18])
+    print(f"{'Endpoint':<{width}}  " + "  ".join(f"{name:<{column}}" for name in names))
+    for endpoint in endpoints:
+        row = []
+        for name in names:
+            summary = results[(endpoint, name)]
+            status = summary['status'] or summary['error'] or '-'
+            latency = f" {summary['p50_ms']:.0f}ms" if summary['p50_ms'] is not None else ''
+            row.append(f"{(status + latency)[:column]:<{column}}")
+        print(f"{endpoint:<{width}}  " + "  ".join(row))
@@ -2,7 +2,11 @@ import requests
 import csv
 import re
 import os
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
 from dotenv import load_dotenv
+from saved_search_cache import SavedSearchCache
 
 # Set variables
 load_dotenv()  # take environment variables from .env
@@ -10,13 +14,19 @@ splunk_host = "<your-splunk-instance>"
 splunk_username = os.getenv('username')
 splunk_password = os.getenv('password')
 splunk_app = "<your-app>"
+page_size = 500  # Saved searches per listing request (the REST default is 30)
+workers = 8  # Concurrent requests for changed saved searches and for results
 
 # API endpoints
 reports_endpoint = f"https://{splunk_host}/servicesNS/{splunk_username}/{splunk_app}/saved/searches"
-results_endpoint = f"https://{splunk_host}/servicesNS/{splunk_username}/{splunk_app}/saved/searches/{}/results"
+results_endpoint = reports_endpoint + "/{}/results"
+
+# Authentication, over one keep-alive session shared by every request
+session = requests.Session()
+session.auth = (splunk_username, splunk_password)
+adapter = requests.adapters.HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+session.mount('https://', adapter)
 
-# Authentication
-auth = (splunk_username, splunk_password)
 
 # Function to extract sub-values from the title
 def extract_sub_values(title):
@@ -38,26 +48,91 @@ def extract_sub_values(title):
 
     return sub_values
 
-# Retrieve the list of reports
-response = requests.get(reports_endpoint, auth=auth)
-reports = response.json()["entry"]
+
+def list_reports(page_size=page_size, fields=None):
+    # Page through every saved search with count/offset; `fields` limits the content returned
+    reports = []
+    offset = 0
+    while True:
+        params = {'output_mode': 'json', 'count': page_size, 'offset': offset}
+        if fields:
+            params['f'] = fields
+        response = session.get(reports_endpoint, params=params)
+        response.raise_for_status()
+        body = response.json()
+        reports.extend(body["entry"])
+        offset += len(body["entry"])
+        if not body["entry"] or offset >= body["paging"]["total"]:
+            return reports
+
+
+def cache_entry(report):
+    # The fields the cache keys and compares saved searches on
+    return {'name': report["name"], 'app': report["acl"]["app"], 'owner': report["acl"]["owner"],
+            'updated': report["updated"], 'content': report["content"]}
+
+
+def fetch_report(stub):
+    response = session.get(f"{reports_endpoint}/{quote(stub['name'], safe='')}", params={'output_mode': 'json'})
+    response.raise_for_status()
+    return cache_entry(response.json()["entry"][0])
+
+
+def fetch_changed(changed):
+    # A few changed saved searches are fetched one by one, many through the full listing
+    if len(changed) > args.page_size:
+        wanted = {(stub['app'], stub['owner'], stub['name']) for stub in changed}
+        return [entry for entry in map(cache_entry, list_reports(args.page_size))
+                if (entry['app'], entry['owner'], entry['name']) in wanted]
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        return list(executor.map(fetch_report, changed))
+
+
+def count_results(report_id):
+    results_response = session.get(results_endpoint.format(quote(report_id, safe='')), params={'output_mode': 'json'})
+    results_response.raise_for_status()
+    return len(results_response.json()["results"])
+
+
+# Parse the options
+parser = argparse.ArgumentParser(description="Write the saved searches of a Splunk app to a CSV file.")
+parser.add_argument("--results", action="store_true",
+                    help="Add a Results column with the number of results of each report (one request per report)")
+parser.add_argument("--workers", type=int, default=workers,
+                    help="Number of saved-search and results requests run in parallel")
+parser.add_argument("--page-size", type=int, default=page_size,
+                    help="Saved searches fetched per listing request")
+parser.add_argument("--full", action="store_true",
+                    help="Fetch every saved search again instead of only those updated since the last run")
+args = parser.parse_args()
+
+# List names and update times only, then fetch the saved searches that changed since the last run
+cache = SavedSearchCache()
+stubs = [cache_entry(report) for report in list_reports(args.page_size, fields='title')]
+cache.sync(reports_endpoint, stubs, fetch_changed, full=args.full)
+reports = cache.entries(reports_endpoint)
+cache.close()
+
+# Results are only fetched when asked for, through a bounded pool
+result_counts = [None] * len(reports)
+if args.results:
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        result_counts = list(executor.map(count_results, [report["name"] for report in reports]))
 
 # Extract and store report data in a CSV file
 with open("splunk_reports.csv", "w", newline="") as csvfile:
     writer = csv.writer(csvfile)
-    writer.writerow(["Report Name", "Creator", "App", "Schedule", "Actions", "Acceleration", "Permissions", "Modified", "Embedding"])
+    columns = ["Report Name", "Creator", "App", "Schedule", "Actions", "Acceleration", "Permissions", "Modified", "Embedding"]
+    writer.writerow(columns + (["Results"] if args.results else []))
 
-    for report in reports:
-        report_id = report["name"]
+    for report, result_count in zip(reports, result_counts):
         report_title = report["content"]["title"]
 
-        results_response = requests.get(results_endpoint.format(report_id), auth=auth)
-        results = results_response.json()["results"]
-
         sub_values = extract_sub_values(report_title)
 
-        writer.writerow([report_title, sub_values["Creator"], sub_values["App"], sub_values["Schedule"],
-                         sub_values["Actions"], sub_values["Acceleration"], sub_values["Permissions"],
-                         sub_values["Modified"], sub_values["Embedding"]])
+        row = [report_title, sub_values["Creator"], sub_values["App"], sub_values["Schedule"],
+               sub_values["Actions"], sub_values["Acceleration"], sub_values["Permissions"],
+               sub_values["Modified"], sub_values["Embedding"]]
+        writer.writerow(row + ([result_count] if args.results else []))
 
 print("Reports extracted and saved successfully.")